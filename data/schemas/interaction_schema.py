@@ -1,6 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
 @dataclass
 class InteractionEvent:
     student_id: str
@@ -12,3 +15,79 @@ class InteractionEvent:
     time_spent: float
     activity_type: str
     difficulty: float
+
+
+COLUMNS = [f.name for f in fields(InteractionEvent)]
+
+# Fields a bulk record must carry; the rest fall back to these defaults
+REQUIRED = ["student_id", "timestamp", "concept_id", "is_correct"]
+DEFAULTS = {"attempts": 1, "time_spent": 0.0, "activity_type": "practice", "difficulty": 0.5}
+
+# Named difficulty levels accepted in place of a number
+DIFFICULTY_LEVELS = {"easy": 0.25, "medium": 0.5, "hard": 0.75, "reinforce": 0.0, "mixed": 0.5}
+
+
+def as_strings(values):
+    """`values` as str objects, with missing values kept as None (not "None"/"nan")."""
+    return values.astype(object).where(values.notna(), None).map(lambda v: v if v is None else str(v))
+
+
+def validate_events(df):
+    """Check a frame of raw records against InteractionEvent, column-wise.
+
+    Returns (events, rejected): `events` holds the valid rows with every
+    InteractionEvent field typed, `rejected` has the original index and the
+    first reason each invalid row failed.
+    """
+    df = df.reset_index(drop=True)
+    reason = pd.Series(None, index=df.index, dtype=object)
+
+    def reject(mask, why):
+        reason[mask & reason.isna()] = why
+
+    for col in REQUIRED:
+        if col not in df.columns:
+            df[col] = None
+        reject(df[col].isna(), f"missing {col}")
+
+    timestamp = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601")
+    reject(timestamp.isna(), "bad timestamp")
+
+    is_correct = pd.to_numeric(df["is_correct"].replace({True: 1, False: 0}), errors="coerce")
+    reject(~is_correct.isin([0, 1]), "is_correct must be 0/1")
+
+    def numeric(col):
+        values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        parsed = pd.to_numeric(values, errors="coerce")
+        reject(values.notna() & parsed.isna(), f"bad {col}")
+        return parsed.fillna(DEFAULTS[col])
+
+    attempts = numeric("attempts")
+    reject(attempts < 1, "attempts must be >= 1")
+    time_spent = numeric("time_spent")
+    reject(time_spent < 0, "time_spent must be >= 0")
+
+    difficulty = df["difficulty"] if "difficulty" in df.columns else pd.Series(np.nan, index=df.index)
+    named = difficulty.astype(str).str.lower().map(DIFFICULTY_LEVELS)
+    difficulty = pd.to_numeric(difficulty, errors="coerce").fillna(named).fillna(DEFAULTS["difficulty"])
+
+    student_id = df["student_id"].astype(str)
+    activity_type = df["activity_type"] if "activity_type" in df.columns else pd.Series(None, index=df.index)
+    activity_id = df["activity_id"] if "activity_id" in df.columns else pd.Series(None, index=df.index)
+
+    events = pd.DataFrame({
+        "student_id": student_id,
+        "timestamp": timestamp,
+        # left missing when not given, like events recorded through the API
+        "activity_id": as_strings(activity_id),
+        "concept_id": df["concept_id"].astype(str),
+        "is_correct": is_correct.fillna(0).astype("int64"),
+        "attempts": attempts.astype("int64"),
+        "time_spent": time_spent.astype(float),
+        "activity_type": activity_type.fillna(DEFAULTS["activity_type"]).astype(str),
+        "difficulty": difficulty.astype(float),
+    })[COLUMNS]
+
+    bad = reason.notna()
+    rejected = pd.DataFrame({"index": df.index[bad], "reason": reason[bad].to_numpy()})
+    return events[~bad].reset_index(drop=True), rejected
@@ -1,31 +1,34 @@
-import pandas as pd
 import sys
 import os
 
 os.chdir("C:\\Users\\Vijay 473\\OneDrive\\Desktop\\dsarg_7")
 
+fs = None
 try:
-    # Step 1: Load parquet
-    print("Loading interactions.parquet...")
-    interactions = pd.read_parquet("data/processed/interactions.parquet")
-    print(f"✓ Loaded {len(interactions)} rows")
+    sys.path.insert(0, os.getcwd())
+    from src.storage.interaction_log import InteractionLog
+
+    # Step 1: Load the compacted interactions (base snapshot or partitioned parts)
+    print("Loading interactions dataset...")
+    dataset, tail = InteractionLog("data/processed").snapshot()
+    interactions = dataset.scan()
+    print(f"✓ Loaded {len(interactions)} rows (+ {sum(map(len, tail.values()))} not yet compacted)")
     print(f"Columns: {list(interactions.columns)}")
     print(f"First row:\n{interactions.iloc[0]}")
     
     # Step 2: Test FeatureStore
     print("\n" + "="*50)
     print("Testing FeatureStore...")
-    sys.path.insert(0, os.getcwd())
     from src.storage.feature_store import FeatureStore
     
     fs = FeatureStore()
-    print(f"✓ FeatureStore initialized with {len(fs.interactions)} rows")
+    print(f"✓ FeatureStore initialized with {len(fs.query(columns=['student_id']))} rows")
     
-    sample_student = fs.interactions['student_id'].iloc[0]
-    print(f"Sample student: {sample_student}")
+    sample_student = interactions['student_id'].iloc[0]
+    print(f"Sample student: {sample_student} ({fs.history_length(sample_student)} interactions)")
     
-    features = fs.compute_basic_features(sample_student)
-    print(f"\n✓ Features computed:")
+    features = fs.compute_engagement_features(sample_student)
+    print("\n✓ Features computed:")
     for key, value in features.items():
         print(f"  {key}: {value}")
     
@@ -33,3 +36,7 @@ except Exception as e:
     print(f"✗ Error: {e}")
     import traceback
     traceback.print_exc()
+finally:
+    # seal anything the store opened, even when a step above failed
+    if fs is not None:
+        fs.close()
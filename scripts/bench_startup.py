@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+HISTORY_PATH = Path("data/processed/startup_bench.jsonl")
+# Repo root, put on the child's path so `src` imports when run as `python scripts/bench_startup.py`
+ROOT = Path(__file__).resolve().parents[1]
+
+METRICS = ["process_s", "import_s", "lifespan_s", "ready_s", "first_request_ms", "warm_request_ms"]
+
+
+def _child(learner_id, ready_timeout):
+    """Runs in a fresh interpreter: import the API, wait for /ready, time requests."""
+    start = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from src.api.main import app
+    out = {"import_s": time.perf_counter() - start}
+
+    t = time.perf_counter()
+    with TestClient(app) as client:
+        out["lifespan_s"] = time.perf_counter() - t
+
+        deadline = time.perf_counter() + ready_timeout
+        while True:
+            res = client.get("/ready")
+            if res.status_code == 200 or time.perf_counter() > deadline:
+                break
+            time.sleep(0.01)
+        out["ready_s"] = time.perf_counter() - t
+        out["models"] = res.json()["models"]
+        out["startup_ms"] = res.json()["startup_ms"]
+
+        for key in ("first_request_ms", "warm_request_ms"):
+            t = time.perf_counter()
+            client.get(f"/learner/{learner_id}/next")
+            out[key] = 1000 * (time.perf_counter() - t)
+
+    print(json.dumps(out))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(runs=3, learner_id=1, ready_timeout=120, history_path=HISTORY_PATH):
+    """Cold-start the API `runs` times in fresh processes; record the median to `history_path`."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    results = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", "--learner", str(learner_id), "--ready-timeout", str(ready_timeout)],
+            capture_output=True, text=True, check=True, env=env,
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["process_s"] = time.perf_counter() - t
+        results.append(result)
+
+    record = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "runs": runs,
+        **{m: sorted(r[m] for r in results)[runs // 2] for m in METRICS},
+        "models": results[-1]["models"],
+        "startup_ms": results[-1]["startup_ms"],
+    }
+
+    previous = None
+    if history_path.exists():
+        lines = history_path.read_text().splitlines()
+        previous = json.loads(lines[-1]) if lines else None
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(f"[INFO] Median of {runs} cold starts (commit {record['commit']})")
+    for m in METRICS:
+        delta = f"  ({record[m] - previous[m]:+.3f} vs {previous['commit']})" if previous and m in previous else ""
+        print(f"  {m:18s} {record[m]:10.3f}{delta}")
+    print(f"[INFO] Appended to {history_path.resolve()}")
+    return record
+
+
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--runs", type=int, default=3, help="Cold starts to take the median of")
+    p.add_argument("--learner", type=int, default=1, help="Learner id for the timed requests")
+    p.add_argument("--ready-timeout", type=float, default=120, help="Seconds to wait for /ready")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        _child(args.learner, args.ready_timeout)
+    else:
+        run(runs=args.runs, learner_id=args.learner, ready_timeout=args.ready_timeout)
+
+
+if __name__ == "__main__":
+    _cli()
@@ -0,0 +1,82 @@
+import argparse
+import time
+import json
+import urllib.request
+from itertools import islice
+from pathlib import Path
+
+from src.models.bkt import BKTModel
+from src.storage.bulk_ingest import BULK_BATCH_ROWS, ingest_ndjson
+from src.storage.feature_store import FeatureStore
+from src.storage.mastery_store import MasteryStore
+
+
+def _chunks(path, rows):
+    """Yield (first line number, bytes) for consecutive blocks of `rows` lines."""
+    with open(path, "rb") as f:
+        line = 1
+        while True:
+            block = list(islice(f, rows))
+            if not block:
+                return
+            yield line, b"".join(block)
+            line += len(block)
+
+
+def _post(url, data):
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/x-ndjson"}, method="POST")
+    with urllib.request.urlopen(req) as res:
+        return json.loads(res.read())
+
+
+def ingest_file(path, url=None, rows=BULK_BATCH_ROWS, post_rows=200_000):
+    """Replay an NDJSON export of InteractionEvents.
+
+    With `url` (e.g. http://localhost:8000) blocks of `post_rows` lines are
+    streamed to POST /interactions/bulk; otherwise they are applied directly
+    to the local stores in batches of `rows`.
+    """
+    print(f"[INFO] Reading file: {Path(path).resolve()}")
+    start = time.perf_counter()
+    accepted = rejected = 0
+
+    if url is not None:
+        for _, data in _chunks(path, post_rows):
+            result = _post(url.rstrip("/") + "/interactions/bulk", data)
+            accepted += result["accepted"]
+            rejected += result["rejected"]
+            for err in result["errors"][:5]:
+                print(f"[WARN] {err}")
+    else:
+        store = MasteryStore()
+        fs = FeatureStore()
+        bkt = BKTModel(store=store)
+        try:
+            for first_line, data in _chunks(path, rows):
+                n, errors = ingest_ndjson(data, fs, bkt, first_line)
+                accepted += n
+                rejected += len(errors)
+                for err in errors[:5]:
+                    print(f"[WARN] line {err['line']}: {err['reason']}")
+                elapsed = time.perf_counter() - start
+                print(f"[INFO] {accepted} events applied, {rejected} rejected ({accepted / max(elapsed, 1e-9):,.0f} events/s)")
+        finally:
+            fs.close()
+
+    print(f"[SUCCESS] {accepted} events applied, {rejected} rejected in {time.perf_counter() - start:.1f}s")
+    return accepted, rejected
+
+
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("path", help="NDJSON file, one InteractionEvent per line")
+    p.add_argument("--url", default=None, help="Send to a running API instead of writing the local stores")
+    p.add_argument("--batch-rows", type=int, default=BULK_BATCH_ROWS, help="Events per applied batch (local mode)")
+    p.add_argument("--post-rows", type=int, default=200_000, help="Events per HTTP request (--url mode)")
+    args = p.parse_args()
+
+    ingest_file(args.path, url=args.url, rows=args.batch_rows, post_rows=args.post_rows)
+
+
+if __name__ == "__main__":
+    _cli()
@@ -1,8 +1,14 @@
+import argparse
+import json
+import os
+import shutil
+import time
 import pandas as pd
-from datetime import datetime, timedelta
+import pyarrow.parquet as pq
+from datetime import datetime
 from pathlib import Path
 
-from data.schemas.interaction_schema import InteractionEvent
+from src.storage.interaction_log import N_BUCKETS, InteractionLog
 
 RAW_PATH = Path("data/raw")
 OUT_PATH = Path("data/processed")
@@ -10,62 +16,170 @@ OUT_PATH.mkdir(parents=True, exist_ok=True)
 
 COURSE_START = datetime(2013, 1, 1)
 
-
-def ingest_student_vle():
+CHUNK_SIZE = 500_000
+STAGING_PATH = OUT_PATH / "ingest_studentVle"
+
+
+def convert_chunk(df):
+    """Map a studentVle.csv chunk onto the InteractionEvent schema (vectorized)."""
+    day_offset = pd.to_numeric(df["date"], errors="coerce")
+    df = df[day_offset.notna()]
+    day_offset = day_offset[day_offset.notna()].astype("int64")
+
+    return pd.DataFrame(
+        {
+            "student_id": df["id_student"].astype(str),
+            "timestamp": COURSE_START + pd.to_timedelta(day_offset, unit="D"),
+            "activity_id": df["id_site"].astype(str),
+            "concept_id": "unknown",
+            "is_correct": 1,
+            "attempts": 1,
+            "time_spent": df["sum_click"].astype(float),
+            "activity_type": "vle",
+            "difficulty": 0.5,
+        }
+    ).reset_index(drop=True)
+
+
+def _source_signature(csv_path):
+    st = csv_path.stat()
+    return {"path": str(csv_path.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _load_checkpoint(csv_path):
+    checkpoint = STAGING_PATH / "checkpoint.json"
+    if checkpoint.exists():
+        state = json.loads(checkpoint.read_text())
+        if state.get("source") == _source_signature(csv_path):
+            return state
+        print("[WARN] Source file changed since last run — restarting ingestion")
+    shutil.rmtree(STAGING_PATH, ignore_errors=True)
+    STAGING_PATH.mkdir(parents=True, exist_ok=True)
+    return {"source": _source_signature(csv_path), "chunks": 0, "rows_read": 0, "rows_written": 0}
+
+
+def _save_checkpoint(state):
+    tmp = STAGING_PATH / "checkpoint.json.tmp"
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, STAGING_PATH / "checkpoint.json")
+
+
+def ingest_student_vle(chunksize=CHUNK_SIZE, limit=None, resume=True):
+    """Stream studentVle.csv into staged parquet chunks.
+
+    Each chunk is converted with column operations and written as its own
+    staged file, followed by a checkpoint, so memory stays bounded by the
+    chunk size and an interrupted run picks up after the last finished chunk.
+    Returns the checkpoint state.
+    """
     csv_path = RAW_PATH / "studentVle.csv"
     print(f"[INFO] Reading file: {csv_path.resolve()}")
 
-    df = pd.read_csv(csv_path)
-    print(f"[INFO] Rows loaded from CSV: {len(df)}")
-
-    interactions = []
-
-    for i, row in df.iterrows():
-        try:
-            day_offset = int(row["date"])
-            timestamp = COURSE_START + timedelta(days=day_offset)
-        except Exception:
-            continue
-
-        event = InteractionEvent(
-            student_id=str(row["id_student"]),
-            timestamp=timestamp,
-            activity_id=str(row["id_site"]),
-            concept_id="unknown",
-            is_correct=1,
-            attempts=1,
-            time_spent=float(row["sum_click"]),
-            activity_type="vle",
-            difficulty=0.5,
-        )
-
-        interactions.append(event)
-
-        # Early stop for sanity test
-        if len(interactions) == 5:
+    if not resume:
+        shutil.rmtree(STAGING_PATH, ignore_errors=True)
+    state = _load_checkpoint(csv_path)
+    if state.get("complete"):
+        print("[INFO] Staged chunks already complete")
+        return state
+    if state["chunks"]:
+        print(f"[INFO] Resuming after chunk {state['chunks']} ({state['rows_read']} rows)")
+
+    reader = pd.read_csv(
+        csv_path,
+        chunksize=chunksize,
+        # skip already-ingested data rows without converting them (row 0 is the header)
+        skiprows=range(1, state["rows_read"] + 1),
+        usecols=["id_student", "id_site", "date", "sum_click"],
+    )
+
+    start = time.perf_counter()
+    session_rows = 0
+    for chunk in reader:
+        if limit is not None and state["rows_read"] >= limit:
             break
+        if limit is not None:
+            chunk = chunk.iloc[: limit - state["rows_read"]]
+
+        out = convert_chunk(chunk)
+        part = STAGING_PATH / f"part-{state['chunks']:05d}.parquet"
+        out.to_parquet(part, index=False)
+
+        state["chunks"] += 1
+        state["rows_read"] += len(chunk)
+        state["rows_written"] += len(out)
+        _save_checkpoint(state)
+
+        session_rows += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(
+            f"[INFO] chunk {state['chunks']}: {state['rows_read']} rows read, "
+            f"{state['rows_written']} written ({session_rows / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
 
-    print(f"[INFO] InteractionEvents created: {len(interactions)}")
-    return interactions
-
-
-def main():
+    state["complete"] = limit is None
+    _save_checkpoint(state)
+    print(f"[INFO] InteractionEvents created: {state['rows_written']}")
+    return state
+
+
+def finalize(out_file):
+    """Concatenate staged chunks into one parquet file, one row group per chunk."""
+    parts = sorted(STAGING_PATH.glob("part-*.parquet"))
+    if not parts:
+        return 0
+
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    writer = None
+    rows = 0
+    try:
+        for part in parts:
+            table = pq.read_table(part)
+            if writer is None:
+                schema = table.schema.remove_metadata()
+                writer = pq.ParquetWriter(tmp, schema)
+            writer.write_table(table.cast(schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    os.replace(tmp, out_file)
+    shutil.rmtree(STAGING_PATH, ignore_errors=True)
+    return rows
+
+
+def main(chunksize=CHUNK_SIZE, limit=None, resume=True, partition=True):
     print("[INFO] Starting OULAD ingestion")
 
-    interactions = ingest_student_vle()
+    state = ingest_student_vle(chunksize=chunksize, limit=limit, resume=resume)
 
-    if not interactions:
+    if not state["rows_written"]:
         print("[ERROR] No interactions created. Exiting.")
         return
 
-    df = pd.DataFrame([vars(e) for e in interactions])
     out_file = OUT_PATH / "interactions.parquet"
+    rows = finalize(out_file)
+
+    print(f"[SUCCESS] Saved {rows} rows to: {out_file.resolve()}")
+    print(pq.ParquetFile(out_file).read_row_group(0).slice(0, 5).to_pandas())
+
+    if partition:
+        # bucketed, sorted parts: per-student reads touch a few row groups, not the whole file
+        log = InteractionLog(OUT_PATH)
+        n = log.partition_base()
+        print(f"[INFO] Partitioned {n} rows into {N_BUCKETS} student buckets under {log.parts_dir.resolve()}")
+
 
-    df.to_parquet(out_file, index=False)
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="CSV rows per chunk")
+    p.add_argument("--limit", type=int, default=None, help="Stop after this many CSV rows (sanity runs)")
+    p.add_argument("--no-resume", action="store_true", help="Discard staged chunks and start over")
+    p.add_argument("--no-partition", action="store_true", help="Keep a single interactions.parquet")
+    args = p.parse_args()
 
-    print(f"[SUCCESS] Saved parquet to: {out_file.resolve()}")
-    print(df.head())
+    main(chunksize=args.chunksize, limit=args.limit, resume=not args.no_resume, partition=not args.no_partition)
 
 
 if __name__ == "__main__":
-    main()
+    _cli()
@@ -1,23 +1,228 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List
+
 from fastapi import FastAPI
 from fastapi import Body
+from fastapi import HTTPException
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from src.api.metrics import METRICS, server_timing
+
+from src.api.orchestrator import (
+    explain_risk,
+    get_next_learning_step_versioned,
+    get_next_learning_steps,
+    record_interactions,
+)
+from src.api.registry import current_registry, get_registry
+from src.api.workers import LEARNERS_PER_SLOT, MAX_BATCH_LEARNERS, InferencePool, Overloaded, WriterQueue
+from src.storage.bulk_ingest import BULK_BATCH_ROWS, ingest_ndjson
+
+# Per-request cap on reported validation errors
+MAX_REPORTED_ERRORS = 100
+
+
+def _warm_up():
+    try:
+        get_registry().warm_up()
+    except Exception as e:
+        print(f"[WARN] Model warm-up failed: {e}")
+
+
+def _ready_registry():
+    """The loaded registry, or 503 while warm-up is still running.
+
+    Handlers run on the event loop and must never wait for the load
+    (`get_registry()` blocks until it finishes), so they only look.
+    """
+    registry = current_registry()
+    if registry is None or not registry.ready:
+        raise HTTPException(status_code=503, detail="Models are still loading", headers={"Retry-After": "1"})
+    return registry
+
 
-from src.api.orchestrator import get_next_learning_step, record_interaction
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the feature store and model weights in the background: the worker
+    # accepts connections at once; /ready and model-backed endpoints answer
+    # 503 until the load and warm-up finish
+    warm_up = threading.Thread(target=_warm_up, name="warm-up", daemon=True)
+    warm_up.start()
+    app.state.inference = InferencePool()
+    app.state.writer = WriterQueue(record_interactions)
+    yield
+    # persist everything accepted so far, then seal this worker's
+    # write-ahead segment so it can be compacted
+    warm_up.join()
+    app.state.writer.close()
+    app.state.inference.close()
+    if current_registry() is not None:
+        current_registry().close()
 
-app = FastAPI(title="DSARG API")
+
+app = FastAPI(title="DSARG API", lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.middleware("http")
+async def request_latency(request: Request, call_next):
+    """Observe each request's latency under its route template (not the raw path)."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    METRICS.observe(time.perf_counter() - start, endpoint=route.path if route is not None else "unmatched")
+    return response
 
 
 @app.get("/learner/{learner_id}/next")
-def next_step(learner_id: int):
-    return get_next_learning_step(learner_id)
+async def next_step(learner_id: int, request: Request, response: Response):
+    """Next step for one learner.
+
+    The registry refresh, version check and response cache lookup all run
+    in the inference pool, never on the event loop. The ETag is the
+    learner's version (see `learner_version`); `If-None-Match` answers 304
+    only while the response cache holds a live entry for it, so TTL expiry
+    applies to revalidation too. With `X-Debug-Timing: 1` the per-stage
+    breakdown is returned in a `Server-Timing` header.
+    """
+    _ready_registry()
+    timings = {} if request.headers.get("x-debug-timing") == "1" else None
+    result, version, cached = await app.state.inference.run(get_next_learning_step_versioned, learner_id, None, timings)
+    etag = f'"{learner_id}-{version}"'
+    if cached and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    if timings is not None:
+        response.headers["Server-Timing"] = server_timing(timings)
+    return result
+
+
+class NextStepsRequest(BaseModel):
+    learner_ids: List[int]
+
+
+@app.post("/learners/next")
+async def next_steps(payload: NextStepsRequest):
+    """Next step for many learners in one orchestration pass.
+
+    A malformed body is rejected with 422 by validation. Batches are capped
+    at MAX_BATCH_LEARNERS and charged one inference slot per
+    LEARNERS_PER_SLOT learners.
+    """
+    _ready_registry()
+    learner_ids = payload.learner_ids
+    if len(learner_ids) > MAX_BATCH_LEARNERS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_LEARNERS} learner_ids per request")
+    slots = max(1, -(-len(learner_ids) // LEARNERS_PER_SLOT))
+    results = await app.state.inference.run(get_next_learning_steps, learner_ids, slots=slots)
+    return {"results": [{"learner_id": lid, **r} for lid, r in zip(learner_ids, results)]}
+
+
+@app.get("/learner/{learner_id}/explanation")
+async def risk_explanation(learner_id: int):
+    """Per-feature TreeSHAP attributions of the learner's risk score."""
+    _ready_registry()
+    explanation = (await app.state.inference.run(explain_risk, [learner_id]))[0]
+    if explanation is None:
+        raise HTTPException(status_code=404, detail="No risk explanation for this learner")
+    return explanation
 
 
 @app.post("/learner/{learner_id}/interact")
-def interact(learner_id: int, payload: dict = Body(...)):
-    record_interaction(
-        learner_id=learner_id,
-        concept_id=payload["concept_id"],
-        correct=payload["correct"],
-        time_spent=payload.get("time_spent", 0),
-        
-    )
+async def interact(learner_id: int, payload: dict = Body(...)):
+    """Record an interaction; answers once the group commit holding it is durable."""
+    event = {
+        "learner_id": learner_id,
+        "concept_id": payload["concept_id"],
+        "correct": payload["correct"],
+        "time_spent": payload.get("time_spent", 0),
+    }
+    await asyncio.wrap_future(app.state.writer.submit(event))
     return {"status": "interaction recorded"}
+
+
+@app.post("/interactions/bulk")
+async def bulk_interactions(request: Request):
+    """Stream newline-delimited InteractionEvent records (application/x-ndjson).
+
+    The body is consumed incrementally and applied in batches of
+    BULK_BATCH_ROWS lines (one group commit and one BKT pass each), so a
+    large LMS export is one request instead of one per event.
+    """
+    registry = _ready_registry()
+    accepted, rejected, errors = 0, 0, []
+    line = 1
+    buffer = b""
+
+    async def flush(data):
+        nonlocal accepted, rejected, line
+        n, errs = await app.state.inference.run(ingest_ndjson, data, registry.fs, registry.bkt, line)
+        accepted += n
+        rejected += len(errs)
+        errors.extend(errs[:MAX_REPORTED_ERRORS - len(errors)])
+        line += data.count(b"\n") + 1
+
+    async for chunk in request.stream():
+        buffer += chunk
+        if buffer.count(b"\n") >= BULK_BATCH_ROWS:
+            cut = buffer.rfind(b"\n")
+            data, buffer = buffer[:cut], buffer[cut + 1:]
+            await flush(data)
+    if buffer.strip():
+        await flush(buffer)
+
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once models are loaded and warm, 503 before."""
+    registry = current_registry()
+    body = {
+        "ready": registry is not None and registry.ready,
+        "models": registry.models() if registry is not None else {},
+        "startup_ms": {k: round(1000 * v, 1) for k, v in registry.timings.items()} if registry is not None else {},
+    }
+    if not body["ready"]:
+        return JSONResponse(status_code=503, content=body, headers={"Retry-After": "1"})
+    return body
+
+
+@app.get("/metrics")
+async def metrics():
+    """Stage and request latency histograms, fallback counters and queue gauges (Prometheus text format)."""
+    gauges = {}
+    for name, stats in (("inference", app.state.inference.stats()), ("writer", app.state.writer.stats())):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                gauges[f"dsarg_{name}_{key}"] = (f"{name} {key.replace('_', ' ')}", value)
+    registry = current_registry()
+    if registry is not None:
+        for key, value in registry.response_cache.stats().items():
+            gauges[f"dsarg_response_cache_{key}"] = (f"response cache {key.replace('_', ' ')}", value)
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/status")
+async def status():
+    """Queue depths and load-shedding counters of this worker process."""
+    return {
+        "inference": app.state.inference.stats(),
+        "writer": app.state.writer.stats(),
+        "response_cache": current_registry().response_cache.stats() if current_registry() else None,
+    }
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import defaultdict
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets):
+        self.counts = [0] * n_buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Per-process latency histograms and fallback counters.
+
+    `observe` feeds a histogram keyed by (metric, label value); `fallback`
+    counts how often a stage answered from its heuristic path instead of
+    the model. `render` returns everything in the Prometheus text
+    exposition format for `/metrics`.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)  # metric -> {label value: _Histogram}
+        self._fallbacks = defaultdict(int)
+
+    def observe(self, seconds, stage=None, endpoint=None):
+        """Record one duration for an orchestration `stage` or an HTTP `endpoint`."""
+        metric, key = ("stage", stage) if stage is not None else ("endpoint", endpoint)
+        with self._lock:
+            h = self._histograms[metric].get(key)
+            if h is None:
+                h = self._histograms[metric][key] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    h.counts[i] += 1
+                    break
+            h.sum += seconds
+            h.count += 1
+
+    def fallback(self, stage, n=1):
+        with self._lock:
+            self._fallbacks[stage] += n
+
+    def clock(self, timings=None):
+        return StageClock(self, timings)
+
+    def render(self, gauges=None):
+        """Prometheus text format; `gauges` adds {name: (help, value)} samples."""
+        lines = []
+        names = {
+            "stage": ("dsarg_stage_seconds", "Time per orchestration stage (one observation per pass)"),
+            "endpoint": ("dsarg_request_seconds", "HTTP request latency by route"),
+        }
+        with self._lock:
+            for metric, (name, help_text) in names.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, h in sorted(self._histograms[metric].items()):
+                    cumulative = 0
+                    for bound, n in zip(self.buckets, h.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{_labels(**{metric: key}, le=bound)}}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{_labels(**{metric: key}, le="+Inf")}}} {h.count}')
+                    lines.append(f"{name}_sum{{{_labels(**{metric: key})}}} {h.sum:.6f}")
+                    lines.append(f"{name}_count{{{_labels(**{metric: key})}}} {h.count}")
+
+            lines += [
+                "# HELP dsarg_fallbacks_total Times a stage used its heuristic fallback instead of the model",
+                "# TYPE dsarg_fallbacks_total counter",
+            ]
+            for stage, n in sorted(self._fallbacks.items()):
+                lines.append(f"dsarg_fallbacks_total{{{_labels(stage=stage)}}} {n}")
+
+        for name, (help_text, value) in (gauges or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {float(value):g}"]
+        return "\n".join(lines) + "\n"
+
+
+class StageClock:
+    """Times consecutive stages of one orchestration pass.
+
+    `lap(stage)` closes the stage that has just run: its duration goes to
+    the stage histogram and, when a `timings` dict was given, is added to it
+    (the per-request breakdown behind the debug header).
+    """
+
+    def __init__(self, metrics, timings=None):
+        self.metrics = metrics
+        self.timings = timings
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        elapsed, self._last = now - self._last, now
+        self.metrics.observe(elapsed, stage=stage)
+        if self.timings is not None:
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+
+
+METRICS = Metrics()
+
+
+def server_timing(timings):
+    """`Server-Timing` header value for a {stage: seconds} breakdown."""
+    return ", ".join(f"{stage};dur={1000 * seconds:.2f}" for stage, seconds in timings.items())
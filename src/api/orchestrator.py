@@ -1,188 +1,362 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 import numpy as np
 import pandas as pd
-import torch
 
-from src.storage.feature_store import FeatureStore
-from src.models.bkt import BKTModel
-from src.models.akt import AKT
-from src.models.risk_xgb import RiskModel
-from src.models.rl_agent import LinUCB
-from src.models.ncf import NCF
+from src.api.metrics import METRICS
+from src.api.registry import CONTEXT_DIM, N_ACTIONS, get_registry
+from src.storage.feature_store import normalize_student_id
+from src.storage.student_features import ENGAGEMENT_FEATURES
+from src.models.vocab import Vocabulary
 
 
-def get_next_learning_step(learner_id: int) -> Dict[str, Any]:
+COLD_START = {
+    "concept": "intro",
+    "activity": "video",
+    "resource_id": "demo_welcome",
+    "confidence": 0.25,
+    "explanation": "No history — cold-start fallback",
+}
+
+ACTION_MAP = {
+    0: ("practice", "easy"),
+    1: ("practice", "medium"),
+    2: ("practice", "hard"),
+    3: ("video", "reinforce"),
+    4: ("quiz", "mixed"),
+}
+
+
+def get_next_learning_step(learner_id: int, registry=None, timings=None) -> Dict[str, Any]:
     """Central brain of DSARG_7 — orchestrates inference from all models.
 
     This function uses existing model classes for inference only (no retraining).
-    It is intentionally simple and robust for demo purposes.
+    It is intentionally simple and robust for demo purposes. Models and the
+    feature store come from the process-wide registry, not per request.
+    Pass a dict as `timings` to get the per-stage seconds of this call.
     """
-    fs = FeatureStore()
+    return get_next_learning_steps([learner_id], registry=registry, timings=timings)[0]
 
-    # 1. Load learner interactions (try int and string id variants)
-    student_df = fs.get_student_df(learner_id)
 
-    if student_df.empty:
-        # try string form (some datasets store ids as strings)
-        student_df = fs.interactions[fs.interactions["student_id"] == str(learner_id)].sort_values("timestamp").reset_index(drop=True)
+def get_next_learning_step_versioned(learner_id: int, registry=None, timings=None):
+    """`get_next_learning_step` plus the version the result is valid for.
 
-    if student_df.empty:
-        return {
-            "concept": "intro",
-            "activity": "video",
-            "resource_id": "demo_welcome",
-            "confidence": 0.25,
-            "explanation": "No history — cold-start fallback",
-        }
+    Returns (result, version, cached); `cached` is True when the result
+    was a live response cache entry for that version.
+    """
+    results, versions, cached = _next_steps([learner_id], registry or get_registry(), timings)
+    return results[0], versions[0], cached[0]
 
-    # 2. Update BKT mastery from student's history
-    bkt = BKTModel()
-    # iterate in time order
-    for _, row in student_df.iterrows():
-        concept = row.get("concept_id")
-        correct = bool(row.get("is_correct", False))
-        try:
-            bkt.update(learner_id, concept, correct)
-        except Exception:
-            # skip malformed rows
-            continue
 
-    # average mastery across seen concepts
-    concepts_seen = student_df["concept_id"].unique()
-    mastery_vals = [bkt.get_mastery(learner_id, c) for c in concepts_seen]
-    avg_mastery = float(np.mean(mastery_vals)) if mastery_vals else 0.0
+def learner_version(learner_id, registry=None) -> str:
+    """Version of everything a learner's recommendation depends on.
 
-    # 3. Get a simple AKT-based embedding (use concept embedding of last item)
-    all_concepts = pd.Categorical(fs.interactions["concept_id"]).categories
-    num_concepts = max(1, len(all_concepts))
-    akt = AKT(num_concepts=num_concepts)
+    Built from the model artifact files in use and the learner's history
+    length, so it is the same in every worker and across restarts, and
+    changes when an interaction (and so a reward) is recorded for the
+    learner or a model is retrained. The shared policy is left out on
+    purpose: every learner's reward updates it, and keying on it would
+    invalidate everyone's response on anyone's interaction. The response
+    cache TTL bounds that drift instead. Used as the response cache key
+    and ETag.
+    """
+    registry = registry or get_registry()
+    return f"{registry.model_version}.{registry.fs.history_length(learner_id)}"
 
-    # map last concept to index
-    last_concept = student_df["concept_id"].iloc[-1]
-    try:
-        last_idx = int(pd.Categorical(fs.interactions["concept_id"], categories=all_concepts).codes[student_df.index[-1]])
-    except Exception:
-        # fallback: use index of last concept in categories
-        try:
-            last_idx = int(list(all_concepts).index(last_concept))
-        except Exception:
-            last_idx = 0
 
-    with torch.no_grad():
+def get_next_learning_steps(learner_ids: List[int], registry=None, timings=None) -> List[Dict[str, Any]]:
+    """Batched `get_next_learning_step`: one result per id, in input order.
+
+    Learners whose history has not changed since their last recommendation
+    are answered from the registry's response cache; the rest go through
+    the model pipeline together. Every stage is timed into METRICS.
+    """
+    return _next_steps(learner_ids, registry or get_registry(), timings)[0]
+
+
+def _next_steps(learner_ids, registry, timings):
+    """Results, versions and cache-hit flags; one cache lookup per learner."""
+    cache = registry.response_cache
+    clock = METRICS.clock(timings)
+
+    keys = [normalize_student_id(lid) for lid in learner_ids]
+    versions = [learner_version(lid, registry) for lid in learner_ids]
+    results = [cache.get(key, v) for key, v in zip(keys, versions)]
+    cached = [r is not None for r in results]
+    misses = [i for i, hit in enumerate(cached) if not hit]
+    clock.lap("cache")
+    if misses:
+        computed = _compute_next_steps([learner_ids[i] for i in misses], registry, clock)
+        for i, result in zip(misses, computed):
+            cache.put(keys[i], versions[i], result)
+            results[i] = result
+    return results, versions, cached
+
+
+def _compute_next_steps(learner_ids, registry, clock):
+    """Run the model pipeline for a batch of learners.
+
+    Every model stage runs once for the whole batch (one mastery query, one
+    risk `predict_proba`, one LinUCB scoring pass and one NCF forward pass
+    over the learner x resource block); AKT reads each learner's cached
+    attention state. `clock` times each stage.
+    """
+    fs = registry.fs
+
+    # 1. Load learner interactions (indexed lookup; ids are normalized by the store)
+    histories = [fs.get_student_df(lid) for lid in learner_ids]
+    active = [i for i, df in enumerate(histories) if not df.empty]
+    results = [dict(COLD_START) for _ in learner_ids]
+    clock.lap("history")
+    if len(active) < len(learner_ids):
+        METRICS.fallback("cold_start", len(learner_ids) - len(active))
+    if not active:
+        return results
+
+    ids = [learner_ids[i] for i in active]
+    dfs = [histories[i] for i in active]
+
+    # 2. Read persisted BKT mastery (replayed from history only the first time)
+    bkt = registry.bkt
+    stored = registry.mastery_store.get_students(ids)
+    masteries = []
+    avg_mastery = np.empty(len(ids))
+    for k, (lid, df) in enumerate(zip(ids, dfs)):
+        mastery = stored[str(lid)] or _bootstrap_mastery(bkt, lid, df)
+        masteries.append(mastery)
+        # average mastery across seen concepts
+        mastery_vals = [mastery.get(str(c), bkt.p_init) for c in df["concept_id"].unique()]
+        avg_mastery[k] = float(np.mean(mastery_vals)) if mastery_vals else 0.0
+    clock.lap("bkt")
+
+    # 3. AKT: probability of answering the current concept correctly, from the
+    #    learner's cached attention state (rebuilt only when history changed)
+    last_concepts = [df["concept_id"].iloc[-1] for df in dfs]
+    p_correct = avg_mastery.copy()
+    cache = registry.akt_cache
+    for k, (lid, df) in enumerate(zip(ids, dfs)):
         try:
-            emb = akt.concept_emb(torch.tensor([last_idx])).numpy().squeeze()
-            akt_embedding = emb.tolist()
+            entry = cache.get(normalize_student_id(lid), df)
+            concept = str(last_concepts[k])
+            p_correct[k] = cache.predict(entry, concept, masteries[k].get(concept, bkt.p_init))
         except Exception:
-            akt_embedding = [0.0] * 8
+            # fallback: BKT average stands in for the AKT estimate
+            METRICS.fallback("akt")
+    clock.lap("akt")
 
     # 4. Predict risk (try RiskModel, fallback to heuristic)
-    agg = student_df.agg({"time_spent": "mean", "time_spent": "count", "is_correct": "mean"})
-    X_row = pd.DataFrame([
-        {
-            "avg_time_spent": float(agg.get("time_spent", 0.0)),
-            "total_interactions": int(agg.get("time_spent", 0)),
-            "correct_rate": float(agg.get("is_correct", 0.0)),
-        }
-    ])
+    features = fs.get_features(ids)
 
-    risk_model = RiskModel()
+    risk_model = registry.risk_model
     try:
-        risk_score = float(risk_model.predict_proba(X_row))
+        risk_scores = np.asarray(risk_model.predict_proba(features), dtype=float).reshape(len(ids))
     except Exception:
         # fallback heuristic: lower mastery -> higher risk
-        risk_score = float(max(0.0, 1.0 - avg_mastery))
+        risk_scores = np.maximum(0.0, 1.0 - avg_mastery)
+        METRICS.fallback("risk", len(ids))
+    clock.lap("risk")
 
     # 5. Select next action (RL via LinUCB)
-    context = np.array(
-        [
-            X_row["total_interactions"].iloc[0],
-            X_row["avg_time_spent"].iloc[0],
-            student_df["timestamp"].nunique(),
-            float((student_df["timestamp"].diff().dt.days.max() or 0.0)),
-            risk_score,
-            avg_mastery,
-        ],
-        dtype=float,
-    )
+    contexts = np.column_stack([features[ENGAGEMENT_FEATURES].to_numpy(dtype=float), risk_scores, avg_mastery])
 
-    n_actions = 5
-    agent = LinUCB(n_actions=n_actions, context_dim=len(context))
-    action_idx = agent.select_action(context)
-    action_map = {
-        0: ("practice", "easy"),
-        1: ("practice", "medium"),
-        2: ("practice", "hard"),
-        3: ("video", "reinforce"),
-        4: ("quiz", "mixed"),
-    }
-    activity, difficulty = action_map.get(action_idx, ("practice", "medium"))
+    agent = registry.agent
+    action_idx = agent.select_actions(contexts)
+    try:
+        # remembered so the outcome reported to record_interaction can reward it
+        registry.policy_store.record_decisions(ids, action_idx, contexts)
+    except Exception as e:
+        print(f"[WARN] Could not record policy decisions: {e}")
+        METRICS.fallback("policy_record", len(ids))
+    clock.lap("linucb")
+
+    # 6. Recommend resource (NCF): precomputed top-K index first, live scoring for misses
+    best_resources = [str(c) for c in last_concepts]
+    best_scores = np.full(len(ids), 0.5)
+
+    misses = []
+    for k, lid in enumerate(ids):
+        hit = registry.ncf_index.lookup(lid) if registry.ncf_index is not None else None
+        if hit is None:
+            misses.append(k)
+        else:
+            best_resources[k], best_scores[k] = hit
+
+    if misses:
+        _score_ncf(registry, [ids[k] for k in misses], misses, best_resources, best_scores)
+    clock.lap("ncf")
+
+    for k, i in enumerate(active):
+        activity, difficulty = ACTION_MAP.get(int(action_idx[k]), ("practice", "medium"))
+        risk_score = float(risk_scores[k])
+        results[i] = {
+            "concept": str(last_concepts[k]),
+            "activity": activity,
+            "resource_id": best_resources[k],
+            "confidence": float(0.7 * (1 - risk_score) + 0.3 * best_scores[k]),
+            "p_correct": float(p_correct[k]),
+            "explanation": f"avg_mastery={avg_mastery[k]:.2f}, p_correct={p_correct[k]:.2f}, risk={risk_score:.2f}, action={activity}/{difficulty}",
+        }
 
-    # 6. Recommend resource (NCF)
-    # Prepare resource candidates
-    df_all = fs.interactions.copy()
-    df_all["resource_id"] = df_all["concept_id"].astype(str)
-    df_all["student_code"] = df_all["student_id"].astype("category").cat.codes
-    df_all["resource_code"] = df_all["resource_id"].astype("category").cat.codes
+    return results
 
-    user_code = int(df_all.loc[df_all["student_id"] == learner_id, "student_code"].iloc[0]) if (df_all["student_id"] == learner_id).any() else 0
-    num_users = df_all["student_code"].nunique()
-    num_items = df_all["resource_code"].nunique()
 
-    ncf = NCF(num_users=max(1, num_users), num_items=max(1, num_items))
-    # candidate items
-    candidates = df_all[["resource_id", "resource_code"]].drop_duplicates().reset_index(drop=True)
-    user_tensor = torch.tensor([user_code] * len(candidates), dtype=torch.long)
-    item_tensor = torch.tensor(candidates["resource_code"].values, dtype=torch.long)
+def _score_ncf(registry, ids, slots, best_resources, best_scores):
+    """Live NCF scoring for learners missing from the top-K index."""
+    # torch is imported on first use so importing the API stays cheap
+    import torch
+    from src.models.ncf import NCF
 
+    if registry.ncf is not None and registry.ncf_vocab is not None:
+        # codes the trained weights were built with
+        students, resources = registry.ncf_vocab["users"], registry.ncf_vocab["items"]
+    else:
+        # untrained model: any consistent coding will do
+        students, resources = Vocabulary(), registry.concept_vocab
+
+    ncf = registry.ncf
+    if ncf is None:
+        ncf = NCF(num_users=max(1, len(students)), num_items=max(1, len(resources)))
+
+    user_codes = students.encode([normalize_student_id(lid) for lid in ids])
+    user_codes[user_codes < 0] = 0
+
+    # score the whole learner x resource block in one forward pass
+    scorable = user_codes < ncf.user_emb.num_embeddings
     try:
-        with torch.no_grad():
-            scores = ncf(user_tensor, item_tensor).squeeze().numpy()
-        best_idx = int(np.argmax(scores))
-        best_resource = candidates.loc[best_idx, "resource_id"]
-        best_score = float(scores[best_idx])
+        if scorable.any():
+            users = torch.as_tensor(user_codes[scorable], dtype=torch.long)
+            items = torch.arange(len(resources), dtype=torch.long)
+            with torch.no_grad():
+                scores = ncf(
+                    users.repeat_interleave(len(items)), items.repeat(len(users))
+                ).reshape(len(users), len(items)).numpy()
+            best_idx = scores.argmax(axis=1)
+            for k, row, j in zip(np.nonzero(scorable)[0], scores, best_idx):
+                best_resources[slots[k]] = resources[j]
+                best_scores[slots[k]] = float(row[j])
     except Exception:
-        # fallback: pick most recent concept
-        best_resource = str(student_df["concept_id"].iloc[-1])
-        best_score = 0.5
+        # fallback: pick most recent concept (already filled in)
+        METRICS.fallback("ncf", int(scorable.sum()))
 
-    confidence = float(0.7 * (1 - risk_score) + 0.3 * best_score)
 
-    explanation = f"avg_mastery={avg_mastery:.2f}, risk={risk_score:.2f}, action={activity}/{difficulty}"
+def explain_risk(learner_ids: List[int], registry=None) -> List[Dict[str, Any]]:
+    """TreeSHAP explanation of each learner's risk score, in input order.
 
-    return {
-        "concept": str(last_concept),
-        "activity": activity,
-        "resource_id": best_resource,
-        "confidence": confidence,
-        "explanation": explanation,
-    }
+    Served from the explanation cache; only learners whose features changed
+    since their entry was made are computed (in one batch). Learners without
+    history, or a registry without a trained risk model, get None.
+    """
+    registry = registry or get_registry()
+    results = [None] * len(learner_ids)
+    if registry.risk_explainer is None:
+        return results
+
+    features = registry.fs.get_features(learner_ids)
+    known = np.flatnonzero(features["total_interactions"].to_numpy() > 0)
+    if len(known):
+        for k, explanation in zip(known, registry.risk_explainer.explain(features.iloc[known])):
+            results[k] = explanation
+    return results
 
 
-def record_interaction(learner_id, concept_id, correct, time_spent=0.0, activity_type="practice", difficulty="medium"):
+def record_interaction(learner_id, concept_id, correct, time_spent=0.0, activity_type="practice", difficulty="medium", registry=None):
     """Record an interaction and apply lightweight updates.
 
     Steps:
-    1. Append interaction to FeatureStore (persisted parquet)
-    2. Update BKT (one-step update)
-    3. (AKT) By writing to FeatureStore, AKT can recompute from history on next inference
-    4. Return a small summary
+    1. Append interaction to FeatureStore (append-only log)
+    2. Update BKT (one-step update persisted to the MasteryStore)
+    3. (AKT) Append the step to the learner's cached attention state
+    4. (LinUCB) Reward the learner's last recommended action with the outcome
+    5. Drop the learner's cached recommendation
+    6. Return a small summary
+    """
+    event = {
+        "learner_id": learner_id,
+        "concept_id": concept_id,
+        "correct": correct,
+        "time_spent": time_spent,
+        "activity_type": activity_type,
+        "difficulty": difficulty,
+    }
+    return record_interactions([event], registry=registry, sync=False)[0]
+
+
+def record_interactions(events: List[Dict[str, Any]], registry=None, sync=True) -> List[Dict[str, Any]]:
+    """Batched `record_interaction` (group commit), one summary per event in order.
+
+    All rows go to the FeatureStore in one append (one fsync with `sync`), so
+    they are durable before any model state moves; the per-learner updates
+    then run in arrival order.
     """
-    fs = FeatureStore()
-    row = fs.record_interaction(
-        student_id=learner_id,
-        concept_id=concept_id,
-        is_correct=bool(correct),
-        time_spent=float(time_spent),
-        activity_type=activity_type,
-        difficulty=difficulty,
+    registry = registry or get_registry()
+    fs = registry.fs
+    rows = fs.record_interactions(
+        [
+            {
+                "student_id": e["learner_id"],
+                "concept_id": e["concept_id"],
+                "is_correct": bool(e["correct"]),
+                "time_spent": float(e.get("time_spent", 0.0)),
+                "activity_type": e.get("activity_type", "practice"),
+                "difficulty": e.get("difficulty", "medium"),
+            }
+            for e in events
+        ],
+        sync=sync,
     )
 
-    # One-step BKT update for quick feedback (get_next will recompute full mastery from history)
-    try:
-        bkt = BKTModel()
-        new_mastery = bkt.update(learner_id, concept_id, bool(correct))
-    except Exception:
-        new_mastery = None
+    # history length right after each event, for the AKT cache's one-step append
+    n_rows = [0] * len(events)
+    later = {}
+    for k in range(len(events) - 1, -1, -1):
+        sid = rows[k]["student_id"]
+        n_rows[k] = fs.history_length(sid) - later.get(sid, 0)
+        later[sid] = later.get(sid, 0) + 1
+
+    results = []
+    bootstrapped = set()
+    for k, (e, row) in enumerate(zip(events, rows)):
+        learner_id, concept_id, correct = e["learner_id"], e["concept_id"], e["correct"]
+        # the new row already moved the learner's version; free the stale response
+        registry.response_cache.invalidate(row["student_id"])
+        # One-step BKT update, written through to the persisted mastery table
+        try:
+            if row["student_id"] in bootstrapped:
+                # the replay below already covered this learner's whole history
+                new_mastery = registry.mastery_store.get(learner_id, concept_id)
+            elif registry.mastery_store.has_student(learner_id):
+                prior = registry.bkt.get_mastery(learner_id, concept_id)
+                new_mastery = registry.bkt.update(learner_id, concept_id, bool(correct))
+                # extend the learner's AKT attention cache by this one step
+                registry.akt_cache.append(row["student_id"], concept_id, correct, prior, n_rows=n_rows[k])
+                # online policy update: correctness plus the mastery it produced
+                registry.policy_store.reward(
+                    learner_id, float(bool(correct)) + (new_mastery - prior), N_ACTIONS, CONTEXT_DIM
+                )
+            else:
+                # first state for this learner: seed it from the full history (incl. this row)
+                mastery = _bootstrap_mastery(registry.bkt, learner_id, fs.get_student_df(learner_id))
+                bootstrapped.add(row["student_id"])
+                new_mastery = mastery.get(str(concept_id))
+        except Exception:
+            new_mastery = None
+            METRICS.fallback("record_update")
+
+        results.append({"row": row, "new_mastery": new_mastery})
+    return results
+
+
+def _bootstrap_mastery(bkt, learner_id, student_df):
+    """Replay a learner's history once and persist the resulting mastery state."""
+    if student_df.empty:
+        return {}
+    concepts = student_df["concept_id"].astype(str).to_numpy()
+    trajectory = bkt.batch_mastery(np.zeros(len(concepts)), concepts, student_df["is_correct"])
 
-    return {"row": row, "new_mastery": new_mastery}
+    # last update per concept is the current mastery
+    last = pd.Series(trajectory).groupby(concepts, sort=False)
+    mastery = last.last().to_dict()
+    counts = last.size().to_dict()
+    if bkt.store is not None:
+        bkt.store.set_many((learner_id, c, p, counts[c]) for c, p in mastery.items())
+    return mastery
@@ -0,0 +1,295 @@
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from src.storage.feature_store import FeatureStore
+from src.storage.mastery_store import MasteryStore
+from src.storage.policy_store import PolicyStore
+from src.models.bkt import BKTModel
+from src.models.vocab import Vocabulary, load_vocabs
+from src.models.risk_explain import EXPLANATIONS_PATH, RiskExplanationCache
+from src.api.response_cache import ResponseCache
+
+# torch (AKT, NCF) and xgboost (risk model) are imported by the loaders that
+# need them, so importing the API module does not pay for them up front
+
+MODELS_PATH = Path("models")
+
+# LinUCB policy shape: actions of the orchestrator's ACTION_MAP x context features
+N_ACTIONS = 5
+CONTEXT_DIM = 6
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class ModelRegistry:
+    """Process-lifetime holder for the feature store and trained model weights.
+
+    Everything is loaded once (normally at API startup) and shared by all
+    requests. `refresh()` is cheap (a few `stat` calls) and reloads only the
+    artifacts whose file changed on disk since they were last loaded.
+    """
+
+    def __init__(self, models_path=MODELS_PATH):
+        self.models_path = Path(models_path)
+        self.akt_path = self.models_path / "akt.pt"
+        self.akt_vocab_path = self.models_path / "akt_vocab.json"
+        self.ncf_path = self.models_path / "ncf.pt"
+        self.ncf_vocab_path = self.models_path / "ncf_vocab.json"
+        self.ncf_index_path = self.models_path / "ncf_topk.npz"
+        self.risk_path = self.models_path / "risk_xgb.ubj"
+
+        self._lock = threading.RLock()
+        self._mtimes = {}
+        self._artifacts = []
+        self._loaded = False
+
+        self.fs = None
+        self.mastery_store = None
+        self.bkt = None
+        self.akt = None
+        self.concept_vocab = None
+        self.akt_cache = None
+        self.ncf = None
+        self.ncf_vocab = None
+        self.ncf_index = None
+        self.risk_model = None
+        self.risk_explainer = None
+        self.policy_store = None
+        self.agent = None
+        self.policy_version = None
+        # stamp of the artifact files in use; part of every learner's response version
+        self.model_version = None
+        self.response_cache = ResponseCache()
+        # startup progress, reported by the readiness endpoint
+        self.ready = False
+        self.timings = {}
+
+    def load(self):
+        with self._lock:
+            start = time.perf_counter()
+            self.fs = FeatureStore()
+            self.fs.start_compaction()
+            self.mastery_store = MasteryStore()
+            self.bkt = BKTModel(store=self.mastery_store)
+            # (files, loader): the loader reruns when any of its files changes
+            self._artifacts = [
+                ((self.akt_path,), self._load_akt),
+                ((self.akt_vocab_path,), self._load_akt_vocab),
+                ((self.ncf_path,), self._load_ncf),
+                ((self.ncf_vocab_path,), self._load_ncf_vocab),
+                ((self.ncf_index_path,), self._load_ncf_index),
+                # explanations are only valid for the model they came from
+                ((self.risk_path, EXPLANATIONS_PATH), self._load_risk),
+            ]
+            self.timings["feature_store"] = time.perf_counter() - start
+            for paths, loader in self._artifacts:
+                start = time.perf_counter()
+                loader()
+                self.timings[paths[0].name] = time.perf_counter() - start
+            self.model_version = self._model_version()
+            self.policy_store = PolicyStore()
+            self._load_policy()
+            self._loaded = True
+        return self
+
+    def warm_up(self):
+        """Run each loaded model once on a dummy input, then mark the registry ready.
+
+        The first call into torch or XGBoost pays one-off setup (kernel
+        selection, allocator, booster caches); paying it here keeps it off
+        the first learner's request.
+        """
+        import torch
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            for name, fn in [
+                ("akt", lambda: self.akt(
+                    torch.zeros(1, 2, dtype=torch.long), torch.zeros(1, 2, dtype=torch.long),
+                    torch.full((1, 2, 1), 0.5), causal=True,
+                )),
+                ("ncf", lambda: self.ncf(torch.zeros(1, dtype=torch.long), torch.zeros(1, dtype=torch.long))),
+                ("risk", lambda: self.risk_model.predict_proba(np.zeros((1, len(self.risk_model.features))))),
+            ]:
+                try:
+                    fn()
+                except Exception:
+                    # missing or untrained model: the orchestrator's fallback covers it
+                    continue
+        self.timings["warm_up"] = time.perf_counter() - start
+        self.ready = True
+        return self
+
+    def models(self):
+        """Which model backends are loaded (False means the request path uses a fallback)."""
+        return {
+            "akt": self.akt is not None,
+            "ncf": self.ncf is not None,
+            "ncf_index": self.ncf_index is not None,
+            "risk": self.risk_model is not None and self.risk_model.booster is not None,
+            "risk_explanations": self.risk_explainer is not None,
+            "policy": self.agent is not None,
+        }
+
+    def refresh(self):
+        """Reload any artifact whose file changed since it was loaded.
+
+        The LinUCB policy is reloaded when its stored version moved (another
+        worker rewarded a decision or a trained policy was saved).
+        """
+        if not self._loaded:
+            return self.load()
+
+        with self._lock:
+            self.fs.refresh()
+            reloaded = False
+            for paths, loader in self._artifacts:
+                if any(_mtime(p) != self._mtimes.get(p) for p in paths):
+                    loader()
+                    reloaded = True
+            if reloaded:
+                self.model_version = self._model_version()
+                self.response_cache.clear()
+            if self.policy_store.version() != self.policy_version:
+                self._load_policy()
+        return self
+
+    def _model_version(self):
+        # derived from the files, not a counter: identical in every worker and across restarts
+        key = ";".join(f"{p.name}={self._mtimes.get(p)}" for paths, _ in self._artifacts for p in paths)
+        return f"{zlib.crc32(key.encode()):08x}"
+
+    def close(self):
+        with self._lock:
+            if self.fs is not None:
+                self.fs.close()
+
+    def _load_file(self, path, fn):
+        self._mtimes[path] = _mtime(path)
+        if self._mtimes[path] is None:
+            return None
+        try:
+            return fn(path)
+        except Exception as e:
+            print(f"[WARN] Could not load {path}: {e}")
+            return None
+
+    def _load_state(self, path):
+        import torch
+
+        return self._load_file(path, lambda p: torch.load(p, map_location="cpu"))
+
+    def _load_akt(self):
+        from src.models.akt import AKT
+
+        state = self._load_state(self.akt_path)
+        if state is not None:
+            model = AKT(num_concepts=state["concept_emb.weight"].shape[0])
+            model.load_state_dict(state)
+        else:
+            # untrained fallback sized to the concepts currently in the store
+            model = AKT(num_concepts=max(1, self.fs.query(columns=["concept_id"])["concept_id"].nunique()))
+        self.akt = model.eval()
+        self._reset_akt_cache()
+
+    def _load_ncf(self):
+        from src.models.ncf import NCF
+
+        state = self._load_state(self.ncf_path)
+        if state is not None:
+            model = NCF(
+                num_users=state["user_emb.weight"].shape[0],
+                num_items=state["item_emb.weight"].shape[0],
+            )
+            model.load_state_dict(state)
+            self.ncf = model.eval()
+        else:
+            # sized per request by the orchestrator
+            self.ncf = None
+        self._check_ncf_index()
+
+    def _load_akt_vocab(self):
+        vocabs = self._load_file(self.akt_vocab_path, load_vocabs)
+        if vocabs is not None:
+            self.concept_vocab = vocabs["concepts"]
+        else:
+            # no persisted vocabulary: sorted concept ids, built once per load
+            self.concept_vocab = Vocabulary.from_values(self.fs.query(columns=["concept_id"])["concept_id"])
+        self._reset_akt_cache()
+
+    def _reset_akt_cache(self):
+        # cached keys/values belong to one set of weights and concept codes
+        if self.akt is not None and self.concept_vocab is not None:
+            from src.models.akt_cache import AKTInferenceCache
+
+            self.akt_cache = AKTInferenceCache(self.akt, self.concept_vocab, BKTModel())
+
+    def _load_risk(self):
+        from src.models.risk_xgb import RiskModel
+
+        # an untrained model raises on predict; the orchestrator then uses its heuristic
+        self.risk_model = self._load_file(self.risk_path, RiskModel.load) or RiskModel()
+        self._load_risk_explanations()
+
+    def _load_risk_explanations(self):
+        self._mtimes[EXPLANATIONS_PATH] = _mtime(EXPLANATIONS_PATH)
+        if self.risk_model.booster is None:
+            self.risk_explainer = None
+            return
+        try:
+            self.risk_explainer = RiskExplanationCache.load(self.risk_model)
+        except Exception as e:
+            print(f"[WARN] Could not load {EXPLANATIONS_PATH}: {e}")
+            self.risk_explainer = RiskExplanationCache(self.risk_model)
+
+    def _load_policy(self):
+        self.agent, self.policy_version = self.policy_store.load(N_ACTIONS, CONTEXT_DIM)
+
+    def _load_ncf_vocab(self):
+        self.ncf_vocab = self._load_file(self.ncf_vocab_path, load_vocabs)
+        self._check_ncf_index()
+
+    def _load_ncf_index(self):
+        from src.models.ncf_index import NCFIndex
+
+        self.ncf_index = self._load_file(self.ncf_index_path, NCFIndex.load)
+        self._check_ncf_index()
+
+    def _check_ncf_index(self):
+        # rankings are only valid for the weights and vocabularies they were built from
+        if self.ncf_index is None:
+            return
+        if self.ncf is None or self.ncf_vocab is None or not self.ncf_index.matches(
+            self._mtimes.get(self.ncf_path), self.ncf_vocab["users"], self.ncf_vocab["items"]
+        ):
+            print(f"[WARN] {self.ncf_index_path} was not built from the current NCF model; "
+                  "scoring live until build_ncf_index runs")
+            self.ncf_index = None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def current_registry():
+    """The process-wide registry if it has finished loading, else None; never loads or refreshes."""
+    return _registry
+
+
+def get_registry():
+    """Return the process-wide registry, loading it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry().load()
+    return _registry.refresh()
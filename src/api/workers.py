@@ -0,0 +1,183 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Inference threads per API worker process; torch/XGBoost release the GIL
+INFERENCE_WORKERS = min(8, os.cpu_count() or 1)
+# Requests allowed to wait for an inference thread before we shed load
+MAX_PENDING_INFERENCE = 32 * INFERENCE_WORKERS
+# Batched next-step requests: learners accepted per call, and per pending slot charged
+MAX_BATCH_LEARNERS = 1_000
+LEARNERS_PER_SLOT = 32
+# Interactions accepted but not yet persisted
+WRITER_QUEUE_SIZE = 10_000
+# Group commit: how long a batch stays open after its first interaction, and its cap
+WRITE_WINDOW_SECONDS = 0.005
+MAX_WRITE_BATCH = 500
+
+
+class Overloaded(Exception):
+    """Raised when a bounded queue is full; the API answers 429."""
+
+    def __init__(self, what, retry_after=1):
+        super().__init__(f"{what} queue is full")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Dedicated, sized thread pool for CPU-bound model work.
+
+    Async endpoints `await run(fn, ...)`, so the event loop never blocks on
+    inference. At most `max_pending` slots may be queued or running; beyond
+    that `run` raises Overloaded straight away instead of letting latency grow.
+    A call holds its `slots` until the function has actually finished, so a
+    client that disconnects does not free capacity its work still uses.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, max_pending=MAX_PENDING_INFERENCE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args, slots=1):
+        slots = min(slots, self.max_pending)
+        with self._lock:
+            if self._pending + slots > self.max_pending:
+                self.rejected += 1
+                raise Overloaded("inference")
+            self._pending += slots
+
+        def release(_):
+            # runs in the worker thread when `fn` returns (or on cancel before it started)
+            with self._lock:
+                self._pending -= slots
+
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class WriterQueue:
+    """Group-commit writer: persistence runs on one background thread.
+
+    Items arriving within `window` seconds of the first one in a batch (up
+    to `max_batch`) are handed to `write_batch(items)` together, so one
+    append and one fsync cover the whole group. `submit` returns a future
+    that resolves with the item's result once its batch is durable; callers
+    await it instead of holding a thread. A full queue raises Overloaded.
+    `close()` drains what was accepted before returning.
+    """
+
+    def __init__(self, write_batch, maxsize=WRITER_QUEUE_SIZE, window=WRITE_WINDOW_SECONDS, max_batch=MAX_WRITE_BATCH):
+        self.write_batch = write_batch
+        self.maxsize = maxsize
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.commit_seconds = 0.0
+        self.max_commit_seconds = 0.0
+        self._thread = threading.Thread(target=self._loop, name="writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            self.rejected += 1
+            raise Overloaded("writer")
+        return future
+
+    def _collect(self):
+        """Block for one item, then gather more until the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is None
+            batch = [b for b in batch if b is not None]
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    # never let one batch take the writer thread down
+                    print(f"[WARN] Writer loop error: {e}")
+            if stop:
+                return
+
+    def _commit(self, batch):
+        # An awaiter that went away cancels its future; the event is still
+        # written, but only futures still pending get a result.
+        live = [future.set_running_or_notify_cancel() for _, future in batch]
+        items = [item for item, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = self.write_batch(items)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"[WARN] Background write of {len(batch)} interactions failed: {e}")
+            for (_, future), ok in zip(batch, live):
+                if ok:
+                    future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+
+        self.processed += len(batch)
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.commit_seconds += elapsed
+        self.max_commit_seconds = max(self.max_commit_seconds, elapsed)
+        for (_, future), ok, result in zip(batch, live, results):
+            if ok:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "depth": self._queue.qsize(),
+            "max_depth": self.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch_size": self.processed / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_commit_ms": 1000 * self.commit_seconds / self.batches if self.batches else 0.0,
+            "max_commit_ms": 1000 * self.max_commit_seconds,
+        }
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
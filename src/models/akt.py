@@ -1,7 +1,32 @@
+import numpy as np
+import pandas as pd
 import torch
 import torch.nn as nn
 
 
+def build_inputs(df, concept_vocab, bkt):
+    """Per-row AKT inputs for a frame sorted by (student_id, timestamp).
+
+    Position t sees its own concept, the student's previous response and the
+    BKT mastery of that concept *before* answering, and is trained to predict
+    its own response; none of the inputs leak the label.
+    """
+    concepts = concept_vocab.encode(df["concept_id"])
+    correct = df["is_correct"].astype(np.int64).to_numpy()
+
+    posterior = bkt.batch_mastery(df["student_id"], df["concept_id"], correct)
+    key = [df["student_id"].to_numpy(), df["concept_id"].astype(str).to_numpy()]
+    prior = pd.Series(posterior).groupby(key, sort=False).shift(1).fillna(bkt.p_init)
+    prev_response = pd.Series(correct).groupby(df["student_id"].to_numpy(), sort=False).shift(1).fillna(0)
+
+    return (
+        concepts,
+        prev_response.to_numpy(dtype=np.int64),
+        prior.to_numpy(dtype=np.float32),
+        correct.astype(np.float32),
+    )
+
+
 class AKT(nn.Module):
     def __init__(
         self,
@@ -25,11 +50,13 @@ class AKT(nn.Module):
 
         self.fc = nn.Linear(embedding_dim, 1)
 
-    def forward(self, concept_ids, responses, mastery_probs):
+    def forward(self, concept_ids, responses, mastery_probs, key_padding_mask=None, causal=False):
         """
         concept_ids: [B, T]
         responses:   [B, T] (0/1)
         mastery:     [B, T, 1]
+        key_padding_mask: optional [B, T] bool, True where a position is padding
+        causal:      if True, position t only attends to positions <= t
         """
 
         c_emb = self.concept_emb(concept_ids)
@@ -38,7 +65,14 @@ class AKT(nn.Module):
 
         x = c_emb + r_emb + m_emb
 
-        attn_out, _ = self.attention(x, x, x)
+        attn_mask = None
+        if causal:
+            T = x.shape[1]
+            attn_mask = torch.triu(torch.ones(T, T, dtype=torch.bool, device=x.device), diagonal=1)
+
+        attn_out, _ = self.attention(
+            x, x, x, key_padding_mask=key_padding_mask, attn_mask=attn_mask, need_weights=False
+        )
         logits = self.fc(attn_out)
 
         return torch.sigmoid(logits)
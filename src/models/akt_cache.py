@@ -0,0 +1,143 @@
+import math
+import threading
+from collections import OrderedDict
+
+import torch
+import torch.nn.functional as F
+
+from src.models.akt import build_inputs
+
+
+class _Entry:
+    __slots__ = ("k", "v", "n_rows", "last_response")
+
+    def __init__(self, k, v, n_rows, last_response):
+        self.k = k
+        self.v = v
+        self.n_rows = n_rows
+        self.last_response = last_response
+
+
+class AKTInferenceCache:
+    """Per-learner key/value cache for serving a trained AKT.
+
+    For each learner we keep the attention keys and values of their last
+    `window - 1` interactions. Predicting the next answer then projects a
+    single query step and attends over the cache, O(window) instead of a
+    full attention pass over the history; recording an answer appends one
+    step. Entries remember how many history rows they cover, so a learner
+    whose history changed elsewhere (another worker, a bulk import) is
+    rebuilt from the feature store on the next read. This is equivalent to
+    the last position of `AKT.forward(..., causal=True)` over the window.
+    """
+
+    def __init__(self, model, concept_vocab, bkt, window=200, max_learners=100_000):
+        self.model = model.eval()
+        self.concept_vocab = concept_vocab
+        self.bkt = bkt
+        self.window = window
+        self.max_learners = max_learners
+
+        attn = model.attention
+        self._heads = attn.num_heads
+        self._head_dim = attn.embed_dim // attn.num_heads
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------ internals
+
+    def _concept_code(self, concept_id):
+        code = self.concept_vocab.get(concept_id, 0)
+        return code if code < self.model.concept_emb.num_embeddings else 0
+
+    def _qkv(self, concepts, responses, mastery):
+        m = self.model
+        x = (
+            m.concept_emb(torch.as_tensor(concepts, dtype=torch.long))
+            + m.response_emb(torch.as_tensor(responses, dtype=torch.long))
+            + m.mastery_proj(torch.as_tensor(mastery, dtype=torch.float).reshape(-1, 1))
+        )
+        return F.linear(x, m.attention.in_proj_weight, m.attention.in_proj_bias).chunk(3, dim=-1)
+
+    def _attend(self, q, k, v):
+        H, d = self._heads, self._head_dim
+        q = q.reshape(1, H, d).transpose(0, 1)  # [H, 1, d]
+        k = k.reshape(-1, H, d).transpose(0, 1)  # [H, n, d]
+        v = v.reshape(-1, H, d).transpose(0, 1)
+        weights = torch.softmax(q @ k.transpose(1, 2) / math.sqrt(d), dim=-1)
+        out = (weights @ v).transpose(0, 1).reshape(1, H * d)
+        out = self.model.attention.out_proj(out)
+        return float(torch.sigmoid(self.model.fc(out)).item())
+
+    def _store(self, student_id, entry):
+        self._entries[student_id] = entry
+        self._entries.move_to_end(student_id)
+        while len(self._entries) > self.max_learners:
+            self._entries.popitem(last=False)
+
+    # ------------------------------------------------------------ public API
+
+    @torch.no_grad()
+    def rebuild(self, student_id, student_df):
+        """(Re)compute a learner's cache from their time-sorted history."""
+        keep = self.window - 1
+        if student_df.empty or keep <= 0:
+            entry = _Entry(None, None, len(student_df), 0)
+        else:
+            concepts, responses, mastery, targets = build_inputs(student_df, self.concept_vocab, self.bkt)
+            concepts[(concepts < 0) | (concepts >= self.model.concept_emb.num_embeddings)] = 0
+            _, k, v = self._qkv(concepts[-keep:], responses[-keep:], mastery[-keep:])
+            entry = _Entry(k, v, len(student_df), int(targets[-1]))
+        with self._lock:
+            self._store(student_id, entry)
+        return entry
+
+    def get(self, student_id, student_df):
+        """Cached entry for a learner, rebuilt if it no longer matches their history."""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is not None:
+                self._entries.move_to_end(student_id)
+        if entry is None or entry.n_rows != len(student_df):
+            entry = self.rebuild(student_id, student_df)
+        return entry
+
+    @torch.no_grad()
+    def predict(self, entry, concept_id, mastery):
+        """P(correct) if the learner answers `concept_id` next."""
+        q, k, v = self._qkv([self._concept_code(concept_id)], [entry.last_response], [mastery])
+        if entry.k is not None:
+            k = torch.cat([entry.k, k])
+            v = torch.cat([entry.v, v])
+        return self._attend(q, k, v)
+
+    @torch.no_grad()
+    def append(self, student_id, concept_id, correct, mastery, n_rows):
+        """Add one recorded interaction to a cached learner (no-op if not cached).
+
+        `mastery` is the BKT mastery of the concept before this answer and
+        `n_rows` the learner's history length including it; if the entry
+        is not exactly one row behind, it is dropped and rebuilt on read.
+        """
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is not None and entry.n_rows != n_rows - 1:
+                del self._entries[student_id]
+                entry = None
+        if entry is None:
+            return
+        _, k, v = self._qkv([self._concept_code(concept_id)], [entry.last_response], [mastery])
+        keep = self.window - 1
+        if entry.k is not None:
+            k = torch.cat([entry.k, k])[-keep:]
+            v = torch.cat([entry.v, v])[-keep:]
+        entry = _Entry(k, v, entry.n_rows + 1, int(bool(correct)))
+        with self._lock:
+            self._store(student_id, entry)
+
+    def invalidate(self, student_id=None):
+        with self._lock:
+            if student_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(student_id, None)
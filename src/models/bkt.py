@@ -1,7 +1,15 @@
 import numpy as np
+import pandas as pd
 from collections import defaultdict
 
 
+def _group_key(values):
+    # dictionary-encoded columns group on their integer codes
+    if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+        return pd.Series(values).cat.codes.to_numpy()
+    return np.asarray(values)
+
+
 class BKTModel:
     def __init__(
         self,
@@ -9,27 +17,28 @@ class BKTModel:
         p_learn=0.15,
         p_guess=0.2,
         p_slip=0.1,
+        store=None,
     ):
         """
         p_init  : Initial probability student knows a concept
         p_learn : Probability of learning after an interaction
         p_guess : Probability of guessing correctly
         p_slip  : Probability of slipping despite knowing
+        store   : Optional MasteryStore; when given, updates are written
+                  through to it instead of the in-memory dict
         """
         self.p_init = p_init
         self.p_learn = p_learn
         self.p_guess = p_guess
         self.p_slip = p_slip
 
+        self.store = store
         self.mastery = defaultdict(lambda: self.p_init)
 
-    def update(self, student_id, concept_id, correct):
+    def posterior(self, p_known, correct):
         """
-        Update mastery probability using Bayes rule
+        One BKT step: Bayes rule on the observation, then the learning transition
         """
-        key = (student_id, concept_id)
-        p_known = self.mastery[key]
-
         if correct:
             numerator = p_known * (1 - self.p_slip)
             denominator = numerator + (1 - p_known) * self.p_guess
@@ -40,10 +49,84 @@ class BKTModel:
         posterior = numerator / denominator
 
         # Learning transition
-        posterior = posterior + (1 - posterior) * self.p_learn
+        return posterior + (1 - posterior) * self.p_learn
+
+    def update(self, student_id, concept_id, correct):
+        """
+        Update mastery probability using Bayes rule
+        """
+        if self.store is not None:
+            return self.store.update(
+                student_id,
+                concept_id,
+                lambda p_known: self.posterior(p_known, correct),
+                default=self.p_init,
+            )
 
+        key = (student_id, concept_id)
+        posterior = self.posterior(self.mastery[key], correct)
         self.mastery[key] = posterior
         return posterior
 
     def get_mastery(self, student_id, concept_id):
+        if self.store is not None:
+            return self.store.get(student_id, concept_id, default=self.p_init)
         return self.mastery[(student_id, concept_id)]
+
+    def batch_mastery(self, student_ids, concept_ids, correct, initial=None):
+        """
+        Vectorized equivalent of calling update() on every row in order,
+        starting from p_init for each (student, concept), or from `initial`
+        (per row, constant within a key) to continue stored state. Rows of
+        the same key must already be in time order. Returns the mastery after
+        each row, aligned with the input.
+
+        In terms of the unnormalized (known, unknown) mass a BKT step is
+        linear, so each trajectory is a running product of 2x2 matrices,
+        computed for all keys at once with a segmented prefix scan in
+        O(N log L) numpy work (L = longest per-key sequence).
+        """
+        correct = np.asarray(correct).astype(bool)
+        n = len(correct)
+        if n == 0:
+            return np.empty(0)
+
+        keys = (
+            pd.DataFrame({"s": _group_key(student_ids), "c": _group_key(concept_ids)})
+            .groupby(["s", "c"], sort=False)
+            .ngroup()
+            .to_numpy()
+        )
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        arange = np.arange(n)
+        pos = arange - np.maximum.accumulate(np.where(starts, arange, 0))
+
+        # per-row step matrix: learning transition @ observation likelihood
+        c = correct[order]
+        known = np.where(c, 1 - self.p_slip, self.p_slip)
+        unknown = np.where(c, self.p_guess, 1 - self.p_guess)
+        M = np.zeros((n, 2, 2))
+        M[:, 0, 0] = known
+        M[:, 0, 1] = self.p_learn * unknown
+        M[:, 1, 1] = (1 - self.p_learn) * unknown
+
+        # Hillis-Steele inclusive scan within each key's segment
+        d = 1
+        max_pos = pos.max()
+        while d <= max_pos:
+            idx = np.nonzero(pos >= d)[0]
+            prod = M[idx] @ M[idx - d]
+            # only the ratio matters; rescale to avoid underflow on long histories
+            prod /= prod.max(axis=(1, 2), keepdims=True)
+            M[idx] = prod
+            d *= 2
+
+        p0 = self.p_init if initial is None else np.asarray(initial, dtype=float)[order]
+        k = M[:, 0, 0] * p0 + M[:, 0, 1] * (1 - p0)
+        u = M[:, 1, 0] * p0 + M[:, 1, 1] * (1 - p0)
+
+        out = np.empty(n)
+        out[order] = k / (k + u)
+        return out
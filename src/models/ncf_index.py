@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import torch
+
+from src.models.vocab import Vocabulary
+from src.storage.feature_store import normalize_student_id
+
+
+def _mastered_mask(interactions, users, items, user_rows):
+    """[len(user_rows), len(items)] bool mask of resources each user already answered correctly."""
+    mask = np.zeros((len(user_rows), len(items)), dtype=bool)
+    if interactions.empty:
+        return mask
+    row_of = np.full(len(users), -1)
+    row_of[user_rows] = np.arange(len(user_rows))
+    correct = interactions[interactions["is_correct"].astype(bool)]
+    u = users.encode(correct["student_id"])
+    i = items.encode(correct["concept_id"])
+    keep = (u >= 0) & (i >= 0)
+    rows = row_of[u[keep]]
+    mask[rows[rows >= 0], i[keep][rows >= 0]] = True
+    return mask
+
+
+class NCFIndex:
+    """Offline per-user top-K resource ranking from a trained NCF model.
+
+    Rows are aligned with the user codes of the vocabulary the model was
+    trained with, so a lookup is one dict access plus one array row. Resources
+    a learner already answered correctly are ranked last, which is what makes
+    the list depend on history and is why `refresh()` exists. `counts` holds
+    each user's history length at ranking time and `model_mtime` the mtime of
+    the weights file the index was built from.
+    """
+
+    def __init__(self, users, items, topk, scores, counts=None, model_mtime=None):
+        self.users = users
+        self.items = items
+        self.topk = topk
+        self.scores = scores
+        self.counts = counts
+        self.model_mtime = model_mtime
+
+    # ------------------------------------------------------------ building
+
+    @staticmethod
+    def _score_rows(model, user_rows, n_items, mastered, k, block=256):
+        topk = np.empty((len(user_rows), k), dtype=np.int32)
+        scores = np.empty((len(user_rows), k), dtype=np.float32)
+        items = torch.arange(n_items, dtype=torch.long)
+        model.eval()
+        with torch.no_grad():
+            for start in range(0, len(user_rows), block):
+                users = torch.as_tensor(user_rows[start:start + block], dtype=torch.long)
+                s = model(users.repeat_interleave(n_items), items.repeat(len(users)))
+                s = s.reshape(len(users), n_items)
+                # push already-mastered resources below everything else
+                ranked = s - torch.as_tensor(mastered[start:start + block], dtype=s.dtype) * 2.0
+                idx = torch.topk(ranked, k, dim=1).indices
+                topk[start:start + len(users)] = idx.numpy()
+                scores[start:start + len(users)] = torch.gather(s, 1, idx).numpy()
+        return topk, scores
+
+    @classmethod
+    def build(cls, model, users, items, interactions, k=10, model_mtime=None):
+        k = min(k, len(items))
+        user_rows = np.arange(len(users))
+
+        mastered = _mastered_mask(interactions, users, items, user_rows)
+        topk, scores = cls._score_rows(model, user_rows, len(items), mastered, k)
+
+        codes = users.encode(interactions["student_id"]) if len(interactions) else np.empty(0, dtype=np.int64)
+        counts = np.bincount(codes[codes >= 0], minlength=len(users)).astype(np.int64)
+        return cls(users, items, topk, scores, counts, model_mtime)
+
+    def refresh(self, model, store):
+        """Re-rank only users whose history length changed since they were ranked.
+
+        `store` is the FeatureStore: current lengths come from its feature
+        table, so backfilled or late events count as a change too, whatever
+        their timestamps. The changed users' histories are read with a
+        student filter pushed down to disk. Returns the number of users
+        refreshed.
+        """
+        current = store.get_features(self.users.ids)["total_interactions"].to_numpy(dtype=np.int64)
+        changed = np.flatnonzero(current != self.counts)
+        if len(changed):
+            history = store.query(
+                columns=["student_id", "concept_id", "is_correct"], student_ids=self.users.decode(changed)
+            )
+            mastered = _mastered_mask(history, self.users, self.items, changed)
+            topk, scores = self._score_rows(model, changed, len(self.items), mastered, self.topk.shape[1])
+            self.topk[changed] = topk
+            self.scores[changed] = scores
+
+        self.counts = current
+        return len(changed)
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path):
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            users=np.array(self.users.ids, dtype=str),
+            items=np.array(self.items.ids, dtype=str),
+            topk=self.topk,
+            scores=self.scores,
+            counts=self.counts,
+            model_mtime=np.array(-1 if self.model_mtime is None else self.model_mtime, dtype=np.int64),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            # indexes written before counts/model_mtime were stored load as stale
+            mtime = int(data["model_mtime"]) if "model_mtime" in data else -1
+            return cls(
+                users=Vocabulary(data["users"].tolist()),
+                items=Vocabulary(data["items"].tolist()),
+                topk=data["topk"],
+                scores=data["scores"],
+                counts=data["counts"] if "counts" in data else None,
+                model_mtime=None if mtime < 0 else mtime,
+            )
+
+    def matches(self, model_mtime, users, items):
+        """True if the index was built from these weights and vocabularies."""
+        return (
+            self.counts is not None and self.model_mtime is not None and self.model_mtime == model_mtime
+            and self.users == users and self.items == items
+        )
+
+    # ------------------------------------------------------------ serving
+
+    def lookup(self, student_id):
+        """Best (resource_id, score) for a learner, or None if not indexed."""
+        code = self.users.get(normalize_student_id(student_id))
+        if code < 0:
+            return None
+        return self.items[self.topk[code, 0]], float(self.scores[code, 0])
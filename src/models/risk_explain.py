@@ -0,0 +1,128 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.storage.feature_store import DATA_PATH, normalize_student_id
+
+EXPLANATIONS_PATH = DATA_PATH / "risk_explanations.parquet"
+# Learners kept in memory by the serving cache (least recently used go first)
+EXPLANATION_CACHE_ENTRIES = 100_000
+
+
+class RiskExplanationCache:
+    """Per-learner TreeSHAP attributions of the risk model, computed once.
+
+    Entries are keyed by student and tagged with a feature version (the
+    learner's interaction count, which changes whenever their features do),
+    so a lookup only computes attributions for learners that are new or
+    changed since their entry was made, and does so in one batch. The whole
+    cache belongs to one model version; `build()` fills it offline and
+    `save()`/`load()` carry it across restarts. At most `max_entries`
+    learners are kept, least recently used evicted first (None: no bound,
+    for the offline build).
+    """
+
+    def __init__(self, model, max_entries=EXPLANATION_CACHE_ENTRIES):
+        self.model = model
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # sid -> (feature version, contributions, base value)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _versions(features):
+        return features["total_interactions"].to_numpy(dtype=np.int64)
+
+    def _compute(self, features):
+        contribs, base = self.model.explain(features)
+        entries = {
+            sid: (int(v), c, float(b))
+            for sid, v, c, b in zip(features.index, self._versions(features), contribs, base)
+        }
+        with self._lock:
+            self._entries.update(entries)
+            self._evict()
+        return entries
+
+    def _evict(self):
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def build(self, features, batch_size=10_000):
+        """Compute attributions for every row of a feature table, in batches."""
+        for start in range(0, len(features), batch_size):
+            self._compute(features.iloc[start:start + batch_size])
+        return len(self._entries)
+
+    def explain(self, features):
+        """Explanations for the learners (index) of a feature table.
+
+        Returns one dict per row: risk, base value and per-feature attributions
+        (log-odds). Only learners without a current entry are computed.
+        """
+        versions = self._versions(features)
+        with self._lock:
+            cached = [self._entries.get(sid) for sid in features.index]
+            for sid, e in zip(features.index, cached):
+                if e is not None:
+                    self._entries.move_to_end(sid)
+        stale = [k for k, (e, v) in enumerate(zip(cached, versions)) if e is None or e[0] != v]
+        if stale:
+            fresh = self._compute(features.iloc[stale])
+            for k in stale:
+                cached[k] = fresh[features.index[k]]
+
+        out = []
+        for (_, contribs, base), (_, row) in zip(cached, features.iterrows()):
+            margin = base + float(contribs.sum())
+            out.append({
+                "risk": float(1.0 / (1.0 + np.exp(-margin))),
+                "base_value": base,
+                "attributions": dict(zip(self.model.features, map(float, contribs))),
+                "features": {f: float(row[f]) for f in self.model.features},
+            })
+        return out
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path=EXPLANATIONS_PATH):
+        with self._lock:
+            items = list(self._entries.items())
+        contribs = np.array([e[1] for _, e in items], dtype=np.float32).reshape(len(items), len(self.model.features))
+        table = pa.table({
+            "student_id": [sid for sid, _ in items],
+            "feature_version": np.array([e[0] for _, e in items], dtype=np.int64),
+            "base_value": np.array([e[2] for _, e in items], dtype=np.float32),
+            **{f: contribs[:, k] for k, f in enumerate(self.model.features)},
+        })
+        table = table.replace_schema_metadata({b"model_version": str(self.model.version).encode()})
+        tmp = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, model, path=EXPLANATIONS_PATH, max_entries=EXPLANATION_CACHE_ENTRIES):
+        """Cache for `model`, pre-filled from `path` if it was built for the same model."""
+        cache = cls(model, max_entries=max_entries)
+        if not path.exists():
+            return cache
+        table = pq.read_table(path)
+        if table.schema.metadata.get(b"model_version", b"").decode() != str(model.version):
+            print("[WARN] Stored risk explanations belong to another model version — ignoring them")
+            return cache
+        if max_entries is not None and table.num_rows > max_entries:
+            table = table.slice(table.num_rows - max_entries)
+        df = table.to_pandas()
+        contribs = df[model.features].to_numpy(dtype=np.float32)
+        cache._entries = OrderedDict(
+            (normalize_student_id(sid), (int(v), c, float(b)))
+            for sid, v, c, b in zip(df["student_id"], df["feature_version"], contribs, df["base_value"])
+        )
+        return cache
@@ -1,8 +1,21 @@
+import json
+import os
+import zlib
+
+import numpy as np
 import xgboost as xgb
 
 
 class RiskModel:
-    def __init__(self):
+    """XGBoost at-risk classifier.
+
+    Training goes through the sklearn wrapper; prediction uses the booster
+    directly (`inplace_predict`, no DMatrix), which is what keeps a single
+    row well under a millisecond. `n_threads` is the booster's thread count:
+    1 suits the per-request path, 0 (all cores) suits batch scoring.
+    """
+
+    def __init__(self, n_threads=1):
         self.model = xgb.XGBClassifier(
             n_estimators=200,
             max_depth=4,
@@ -12,9 +25,70 @@ class RiskModel:
             objective="binary:logistic",
             eval_metric="logloss",
         )
+        self.n_threads = n_threads
+        self.booster = None
+        self.features = None
+        self.version = None
 
     def train(self, X, y):
         self.model.fit(X, y)
+        self.features = list(X.columns)
+        self._set_booster(self.model.get_booster())
+
+    def _set_booster(self, booster):
+        booster.set_param({"nthread": self.n_threads})
+        self.booster = booster
+        # identifies these exact trees, e.g. for caches of derived values
+        self.version = f"{zlib.crc32(booster.save_raw()):08x}"
 
     def predict_proba(self, X):
-        return self.model.predict_proba(X)[:, 1]
+        """P(at risk) per row.
+
+        `X` is a DataFrame holding (at least) the trained feature columns, or
+        an array whose columns are already in `self.features` order.
+        """
+        if self.booster is None:
+            raise RuntimeError("RiskModel is not trained or loaded")
+        if hasattr(X, "columns"):
+            X = X[self.features].to_numpy(dtype=np.float32)
+        data = np.ascontiguousarray(X, dtype=np.float32).reshape(-1, len(self.features))
+        return self.booster.inplace_predict(data, validate_features=False)
+
+    def explain(self, X):
+        """TreeSHAP attributions: ([n, n_features] log-odds contributions, [n] base values).
+
+        Uses XGBoost's native TreeSHAP; each row's contributions plus its base
+        value sum to the model's log-odds output.
+        """
+        if self.booster is None:
+            raise RuntimeError("RiskModel is not trained or loaded")
+        if hasattr(X, "columns"):
+            X = X[self.features].to_numpy(dtype=np.float32)
+        data = xgb.DMatrix(np.asarray(X, dtype=np.float32).reshape(-1, len(self.features)),
+                           feature_names=self.features, nthread=self.n_threads)
+        contribs = self.booster.predict(data, pred_contribs=True)
+        return contribs[:, :-1], contribs[:, -1]
+
+    # ------------------------------------------------------------ persistence
+
+    @staticmethod
+    def _schema_path(path):
+        return path.with_name(path.stem + ".schema.json")
+
+    def save(self, path):
+        """Write the booster in XGBoost's native format plus a feature schema next to it."""
+        if self.booster is None:
+            raise RuntimeError("RiskModel is not trained")
+        tmp = path.with_name("tmp." + path.name)
+        self.booster.save_model(tmp)
+        schema = {"features": self.features, "xgboost": xgb.__version__}
+        self._schema_path(path).write_text(json.dumps(schema))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, n_threads=1):
+        schema = json.loads(cls._schema_path(path).read_text())
+        model = cls(n_threads=n_threads)
+        model.features = schema["features"]
+        model._set_booster(xgb.Booster(model_file=str(path)))
+        return model
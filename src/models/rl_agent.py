@@ -2,30 +2,59 @@ import numpy as np
 
 
 class LinUCB:
+    """Disjoint LinUCB with per-action parameters stored as stacked arrays.
+
+    `A` is [n_actions, d, d], `b` is [n_actions, d]. The inverses `A_inv` are
+    kept current with a Sherman-Morrison rank-one update in `update`, so
+    scoring never inverts a matrix: a decision costs O(actions * d^2).
+    """
+
     def __init__(self, n_actions, context_dim, alpha=1.0):
         self.n_actions = n_actions
         self.context_dim = context_dim
         self.alpha = alpha
 
-        self.A = [np.identity(context_dim) for _ in range(n_actions)]
-        self.b = [np.zeros((context_dim, 1)) for _ in range(n_actions)]
+        self.A = np.tile(np.identity(context_dim), (n_actions, 1, 1))
+        self.A_inv = self.A.copy()
+        self.b = np.zeros((n_actions, context_dim))
 
-    def select_action(self, context):
-        context = context.reshape(-1, 1)
-        scores = []
+    def scores(self, contexts):
+        """UCB score of every action for a [B, context_dim] array of contexts."""
+        contexts = np.asarray(contexts, dtype=float).reshape(-1, self.context_dim)
+        theta = np.einsum("aij,aj->ai", self.A_inv, self.b)
+        # x^T A_a^-1 x for every (context, action) pair at once
+        var = np.einsum("bi,aij,bj->ba", contexts, self.A_inv, contexts)
+        return contexts @ theta.T + self.alpha * np.sqrt(var)
 
-        for a in range(self.n_actions):
-            A_inv = np.linalg.inv(self.A[a])
-            theta = A_inv @ self.b[a]
-            p = (
-                theta.T @ context
-                + self.alpha * np.sqrt(context.T @ A_inv @ context)
-            )
-            scores.append(float(p.item()))
+    def select_action(self, context):
+        return int(np.argmax(self.scores(context)[0]))
 
-        return int(np.argmax(scores))
+    def select_actions(self, contexts):
+        """Batched select_action: one action per row of `contexts`."""
+        return np.argmax(self.scores(contexts), axis=1)
 
     def update(self, action, context, reward):
-        context = context.reshape(-1, 1)
-        self.A[action] += context @ context.T
-        self.b[action] += reward * context
+        x = np.asarray(context, dtype=float).reshape(self.context_dim)
+        self.A[action] += np.outer(x, x)
+        self.b[action] += reward * x
+
+        # Sherman-Morrison: (A + x x^T)^-1 = A^-1 - (A^-1 x)(x^T A^-1) / (1 + x^T A^-1 x)
+        Ax = self.A_inv[action] @ x
+        self.A_inv[action] -= np.outer(Ax, Ax) / (1.0 + x @ Ax)
+
+    def update_batch(self, actions, contexts, rewards):
+        """Apply a round of updates at once (same A and b as updating row by row).
+
+        Inverses of the touched actions are recomputed directly, which is
+        cheaper than one rank-one step per row once rounds are large.
+        """
+        actions = np.asarray(actions)
+        contexts = np.asarray(contexts, dtype=float).reshape(-1, self.context_dim)
+        rewards = np.asarray(rewards, dtype=float)
+
+        onehot = np.eye(self.n_actions)[actions]  # [B, n_actions]
+        self.A += np.einsum("ba,bi,bj->aij", onehot, contexts, contexts)
+        self.b += np.einsum("ba,b,bi->ai", onehot, rewards, contexts)
+
+        touched = np.unique(actions)
+        self.A_inv[touched] = np.linalg.inv(self.A[touched])
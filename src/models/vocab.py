@@ -0,0 +1,112 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def _is_categorical(values):
+    return isinstance(getattr(values, "dtype", None), pd.CategoricalDtype)
+
+
+class Vocabulary:
+    """Stable id <-> integer code mapping shared by training and serving.
+
+    Codes are never reassigned: ids seen for the first time are appended
+    after the existing ones, so embeddings trained against an older
+    vocabulary keep lining up. Lookups of single ids are a dict access;
+    `encode` handles whole columns at once.
+    """
+
+    def __init__(self, ids=()):
+        self._ids = []
+        self._codes = {}
+        self._index = None
+        self.add(ids)
+
+    @classmethod
+    def from_values(cls, values):
+        """Vocabulary over the distinct values of a column, in sorted order."""
+        if _is_categorical(values):
+            return cls(sorted(pd.unique(pd.Series(values).dropna()).astype(str)))
+        return cls(sorted(pd.unique(pd.Series(values, dtype=object).astype(str))))
+
+    def add(self, ids):
+        """Append unseen ids; returns the number added."""
+        before = len(self._ids)
+        if _is_categorical(ids):
+            # distinct values in order of appearance, found on the codes
+            ids = pd.unique(pd.Series(ids).dropna()).astype(str)
+        for value in pd.unique(pd.Series(list(ids), dtype=object).astype(str)):
+            if value not in self._codes:
+                self._codes[value] = len(self._ids)
+                self._ids.append(value)
+        if len(self._ids) != before:
+            self._index = None
+        return len(self._ids) - before
+
+    def encode(self, values, add=False):
+        """Codes for a sequence of ids; unknown ids map to -1 unless `add`."""
+        if _is_categorical(values):
+            # look up each dictionary entry once, then gather by code
+            values = pd.Series(values)
+            if add:
+                self.add(values)
+            if self._index is None:
+                self._index = pd.Index(self._ids)
+            lookup = self._index.get_indexer(values.cat.categories.astype(str))
+            codes = values.cat.codes.to_numpy()
+            return np.where(codes >= 0, lookup[codes], -1).astype(np.int64)
+        values = pd.Series(values, dtype=object).astype(str)
+        if add:
+            self.add(values.unique())
+        if self._index is None:
+            self._index = pd.Index(self._ids)
+        return self._index.get_indexer(values).astype(np.int64)
+
+    def get(self, value, default=-1):
+        return self._codes.get(str(value), default)
+
+    def decode(self, codes):
+        return [self._ids[c] for c in codes]
+
+    @property
+    def ids(self):
+        return list(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, value):
+        return str(value) in self._codes
+
+    def __getitem__(self, code):
+        return self._ids[code]
+
+    def __eq__(self, other):
+        return isinstance(other, Vocabulary) and self._ids == other._ids
+
+
+def save_vocabs(path, **vocabs):
+    """Persist named vocabularies (e.g. users=..., items=...) next to model weights."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({name: v.ids for name, v in vocabs.items()}))
+    os.replace(tmp, path)
+
+
+def load_vocabs(path):
+    return {name: Vocabulary(ids) for name, ids in json.loads(path.read_text()).items()}
+
+
+def load_or_create(path, **columns):
+    """Load the vocabularies at `path` and append ids from `columns` (name -> values).
+
+    Missing vocabularies are created from the values in sorted order.
+    """
+    vocabs = load_vocabs(path) if path.exists() else {}
+    for name, values in columns.items():
+        if name in vocabs:
+            vocabs[name].add(values if _is_categorical(values) else pd.Series(values).astype(str).unique())
+        else:
+            vocabs[name] = Vocabulary.from_values(values)
+    return vocabs
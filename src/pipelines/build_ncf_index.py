@@ -0,0 +1,64 @@
+import argparse
+from pathlib import Path
+
+import torch
+
+from src.models.ncf import NCF
+from src.models.ncf_index import NCFIndex
+from src.models.vocab import load_vocabs
+from src.storage.feature_store import FeatureStore
+
+MODELS_PATH = Path("models")
+
+
+def build_ncf_index(k=10, refresh=False, models_path=MODELS_PATH):
+    """Build (or incrementally refresh) models/ncf_topk.npz from models/ncf.pt."""
+    weights_path = models_path / "ncf.pt"
+    vocab_path = models_path / "ncf_vocab.json"
+    index_path = models_path / "ncf_topk.npz"
+
+    if not weights_path.exists() or not vocab_path.exists():
+        print("[WARN] No trained NCF weights/vocabulary — run train_ncf first.")
+        return None
+
+    # stat before reading, so a retrain racing this build makes the index stale, not wrong
+    model_mtime = weights_path.stat().st_mtime_ns
+    state = torch.load(weights_path, map_location="cpu")
+    model = NCF(num_users=state["user_emb.weight"].shape[0], num_items=state["item_emb.weight"].shape[0])
+    model.load_state_dict(state)
+    vocabs = load_vocabs(vocab_path)
+    users, items = vocabs["users"], vocabs["items"]
+
+    fs = FeatureStore()
+
+    index = None
+    if refresh and index_path.exists():
+        index = NCFIndex.load(index_path)
+        # new weights or vocabulary invalidate every row
+        if not index.matches(model_mtime, users, items) or index.topk.shape[1] != min(k, len(items)):
+            print("[INFO] NCF model changed since last build — rebuilding index")
+            index = None
+        else:
+            n = index.refresh(model, fs)
+            print(f"[INFO] Refreshed top-{index.topk.shape[1]} for {n} users")
+
+    if index is None:
+        interactions = fs.query(columns=["student_id", "concept_id", "is_correct"])
+        index = NCFIndex.build(model, users, items, interactions, k=k, model_mtime=model_mtime)
+        print(f"[INFO] Built top-{index.topk.shape[1]} index for {len(users)} users x {len(items)} resources")
+
+    index.save(index_path)
+    return index
+
+
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--k", type=int, default=10, help="Resources kept per user")
+    p.add_argument("--refresh", action="store_true", help="Only re-rank users whose history changed")
+    args = p.parse_args()
+
+    build_ncf_index(k=args.k, refresh=args.refresh)
+
+
+if __name__ == "__main__":
+    _cli()
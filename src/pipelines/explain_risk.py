@@ -0,0 +1,44 @@
+import argparse
+import time
+
+from src.models.risk_explain import EXPLANATIONS_PATH, RiskExplanationCache
+from src.models.risk_xgb import RiskModel
+from src.pipelines.train_risk_model import RISK_MODEL_PATH
+from src.storage.feature_store import FeatureStore
+
+
+def explain_risk(batch_size=10_000, n_threads=0, out_path=EXPLANATIONS_PATH):
+    """Precompute TreeSHAP attributions of every student's risk score.
+
+    The API serves these from its explanation cache and only recomputes
+    learners whose features changed after this run.
+    """
+    if not RISK_MODEL_PATH.exists():
+        print("[WARN] No trained risk model — run train_risk_model first.")
+        return None
+
+    model = RiskModel.load(RISK_MODEL_PATH, n_threads=n_threads)
+    fs = FeatureStore()
+    features = fs.features.frame()
+    fs.close()
+
+    start = time.perf_counter()
+    # every student goes to the file; the API keeps a bounded subset
+    cache = RiskExplanationCache(model, max_entries=None)
+    n = cache.build(features, batch_size=batch_size)
+    cache.save(out_path)
+    print(f"[INFO] Explained {n} students in {time.perf_counter() - start:.2f}s -> {out_path}")
+    return cache
+
+
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--batch-size", type=int, default=10_000, help="Students per TreeSHAP batch")
+    p.add_argument("--threads", type=int, default=0, help="XGBoost threads (0 = all cores)")
+    args = p.parse_args()
+
+    explain_risk(batch_size=args.batch_size, n_threads=args.threads)
+
+
+if __name__ == "__main__":
+    _cli()
@@ -1,36 +1,90 @@
-from src.storage.feature_store import FeatureStore
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.storage.feature_store import FeatureStore, DATA_PATH
+from src.storage.interaction_log import student_bucket
+from src.storage.mastery_store import MasteryStore
 from src.models.bkt import BKTModel
 
+MASTERY_LOG_PATH = DATA_PATH / "mastery_log.parquet"
+
+
+def _shard_mastery(args):
+    params, positions, student_ids, concept_ids, correct = args
+    return positions, BKTModel(**params).batch_mastery(student_ids, concept_ids, correct)
+
+
+def compute_mastery(df, bkt, n_jobs=1):
+    """Mastery after every row of a time-sorted interactions frame.
+
+    With n_jobs > 1 the frame is sharded by student hash and the shards are
+    processed in parallel; keys never span shards, so results are identical.
+    """
+    if n_jobs <= 1 or len(df) == 0:
+        return bkt.batch_mastery(df["student_id"], df["concept_id"], df["is_correct"])
+
+    params = {"p_init": bkt.p_init, "p_learn": bkt.p_learn, "p_guess": bkt.p_guess, "p_slip": bkt.p_slip}
+    shard = df["student_id"].map(lambda sid: student_bucket(sid, n_jobs)).to_numpy()
+    jobs = []
+    for k in range(n_jobs):
+        positions = np.nonzero(shard == k)[0]
+        if len(positions):
+            part = df.iloc[positions]
+            jobs.append((params, positions, part["student_id"].to_numpy(),
+                         part["concept_id"].to_numpy(), part["is_correct"].to_numpy()))
 
-def run_bkt():
+    mastery = np.empty(len(df))
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        for positions, values in pool.map(_shard_mastery, jobs):
+            mastery[positions] = values
+    return mastery
+
+
+def run_bkt(n_jobs=1, out_path=MASTERY_LOG_PATH, update_store=False):
     fs = FeatureStore()
     bkt = BKTModel()
 
-    df = fs.interactions.sort_values("timestamp")
+    df = fs.query(columns=["student_id", "concept_id", "is_correct", "timestamp"])
+    df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
 
-    mastery_log = []
+    mastery_log = pd.DataFrame(
+        {
+            "student_id": df["student_id"],
+            "concept_id": df["concept_id"],
+            "timestamp": df["timestamp"],
+            "mastery": compute_mastery(df, bkt, n_jobs=n_jobs),
+        }
+    )
 
-    for _, row in df.iterrows():
-        mastery = bkt.update(
-            student_id=row["student_id"],
-            concept_id=row["concept_id"],
-            correct=row["is_correct"],
-        )
+    mastery_log.to_parquet(out_path, index=False)
+    print(f"[INFO] Wrote {len(mastery_log)} mastery updates to {out_path}")
 
-        mastery_log.append(
-            {
-                "student_id": row["student_id"],
-                "concept_id": row["concept_id"],
-                "timestamp": row["timestamp"],
-                "mastery": mastery,
-            }
+    if update_store:
+        # final state per (student, concept) becomes the serving state
+        grouped = mastery_log.groupby(["student_id", "concept_id"], sort=False, observed=True)
+        final = grouped["mastery"].last()
+        counts = grouped.size()
+        MasteryStore().set_many(
+            (s, c, p, counts[(s, c)]) for (s, c), p in final.items()
         )
+        print(f"[INFO] Updated mastery store for {len(final)} (student, concept) pairs")
 
     return mastery_log
 
 
-if __name__ == "__main__":
-    mastery = run_bkt()
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--jobs", type=int, default=1, help="Parallel student shards")
+    p.add_argument("--update-store", action="store_true", help="Write final mastery to the serving MasteryStore")
+    args = p.parse_args()
+
+    mastery = run_bkt(n_jobs=args.jobs, update_store=args.update_store)
     print("Sample mastery updates:")
-    for m in mastery[:5]:
-        print(m)
+    print(mastery.head())
+
+
+if __name__ == "__main__":
+    _cli()
@@ -0,0 +1,44 @@
+import argparse
+import os
+import time
+
+from src.models.risk_xgb import RiskModel
+from src.pipelines.train_risk_model import RISK_MODEL_PATH
+from src.storage.feature_store import DATA_PATH, FeatureStore
+
+RISK_SCORES_PATH = DATA_PATH / "risk_scores.parquet"
+
+
+def score_risk(n_threads=0, out_path=RISK_SCORES_PATH):
+    """Score every student with the saved risk model, using all cores by default."""
+    if not RISK_MODEL_PATH.exists():
+        print("[WARN] No trained risk model — run train_risk_model first.")
+        return None
+
+    model = RiskModel.load(RISK_MODEL_PATH, n_threads=n_threads)
+    fs = FeatureStore()
+    features = fs.features.frame()
+    fs.close()
+
+    start = time.perf_counter()
+    features["risk"] = model.predict_proba(features)
+    elapsed = time.perf_counter() - start
+
+    features[["risk"]].reset_index().to_parquet(out_path, index=False)
+    threads = n_threads or os.cpu_count()
+    print(f"[INFO] Scored {len(features)} students in {elapsed:.3f}s ({threads} threads) -> {out_path}")
+    return features
+
+
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--threads", type=int, default=0, help="XGBoost threads (0 = all cores)")
+    args = p.parse_args()
+
+    scores = score_risk(n_threads=args.threads)
+    if scores is not None:
+        print(scores.sort_values("risk", ascending=False).head())
+
+
+if __name__ == "__main__":
+    _cli()
@@ -1,49 +1,125 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
-from src.models.akt import AKT
+from torch.utils.data import Dataset, DataLoader, Sampler
+from src.models.akt import AKT, build_inputs
+from src.models.bkt import BKTModel
+from src.models.vocab import load_or_create, save_vocabs
 from src.storage.feature_store import FeatureStore
 
 
-class AKTDataset(Dataset):
-    def __init__(self, interactions):
-        self.data = interactions
+class AKTSequenceDataset(Dataset):
+    """Per-student interaction sequences, pre-tensorized.
+
+    All rows live in flat tensors; a sample is a (start, end) slice of them,
+    so __getitem__ does no pandas work. Histories longer than `max_len` are
+    split into consecutive windows.
+    """
+
+    def __init__(self, concepts, responses, mastery, targets, student_ids, max_len=200):
+        self.concepts = torch.from_numpy(concepts)
+        self.responses = torch.from_numpy(responses)
+        self.mastery = torch.from_numpy(mastery).unsqueeze(-1)
+        self.targets = torch.from_numpy(targets)
+
+        # sequence boundaries: student changes, then cut every max_len rows
+        ids = np.asarray(student_ids)
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        ends = np.r_[starts[1:], len(ids)]
+        spans = [
+            (s, min(s + max_len, e))
+            for start, e in zip(starts, ends)
+            for s in range(start, e, max_len)
+        ]
+        self.spans = np.array(spans, dtype=np.int64).reshape(-1, 2)
+        self.lengths = self.spans[:, 1] - self.spans[:, 0]
 
     def __len__(self):
-        return len(self.data)
+        return len(self.spans)
 
     def __getitem__(self, idx):
-        row = self.data.iloc[idx]
-        return (
-            torch.tensor([int(row["concept_id_encoded"])], dtype=torch.long),
-            torch.tensor([int(row["is_correct"])], dtype=torch.long),
-            torch.tensor([[float(row["mastery"])]], dtype=torch.float),
-        )
-
+        s, e = self.spans[idx]
+        return self.concepts[s:e], self.responses[s:e], self.mastery[s:e], self.targets[s:e]
+
+
+class BucketBatchSampler(Sampler):
+    """Batches of similar-length sequences so padding stays small.
+
+    Sequences are shuffled, grouped into pools of `pool` batches, sorted by
+    length within each pool and cut into batches; batch order is shuffled.
+    """
+
+    def __init__(self, lengths, batch_size, pool=50, shuffle=True, seed=0):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.pool = pool
+        self.shuffle = shuffle
+        self.rng = np.random.RandomState(seed)
+
+    def __iter__(self):
+        order = self.rng.permutation(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+        size = self.batch_size * self.pool
+        batches = []
+        for p in range(0, len(order), size):
+            chunk = order[p:p + size]
+            chunk = chunk[np.argsort(self.lengths[chunk], kind="stable")]
+            batches.extend(chunk[b:b + self.batch_size] for b in range(0, len(chunk), self.batch_size))
+        if self.shuffle:
+            self.rng.shuffle(batches)
+        return iter([b.tolist() for b in batches])
 
-def train_akt():
-    fs = FeatureStore()
-    df = fs.interactions.copy()
-
-    # Encode concepts
-    df["concept_id_encoded"] = (
-        df["concept_id"].astype("category").cat.codes
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+def pad_collate(batch):
+    concepts, responses, mastery, targets = zip(*batch)
+    pad = torch.nn.utils.rnn.pad_sequence
+    lengths = torch.tensor([len(c) for c in concepts])
+    padding_mask = torch.arange(int(lengths.max()))[None, :] >= lengths[:, None]
+    return (
+        pad(concepts, batch_first=True),
+        pad(responses, batch_first=True),
+        pad(mastery, batch_first=True),
+        pad(targets, batch_first=True),
+        padding_mask,
     )
 
-    # Add BKT mastery
-    df["mastery"] = 0.5  # placeholder (we'll replace with real BKT log next step)
 
-    dataset = AKTDataset(df)
-    loader = DataLoader(dataset, batch_size=32)
+def train_akt(epochs=3, batch_size=64, max_len=200, num_workers=2, lr=1e-3):
+    fs = FeatureStore()
+    df = fs.query(columns=["student_id", "concept_id", "is_correct", "timestamp"])
+    df = df.sort_values(["student_id", "timestamp"], kind="stable").reset_index(drop=True)
+
+    # Encode concepts with the persisted vocabulary (codes stay stable across runs)
+    vocab_path = Path("models/akt_vocab.json")
+    vocabs = load_or_create(vocab_path, concepts=df["concept_id"])
+
+    # Real BKT mastery (prior to each answer) replaces the old 0.5 placeholder
+    concepts, responses, mastery, targets = build_inputs(df, vocabs["concepts"], BKTModel())
+
+    dataset = AKTSequenceDataset(concepts, responses, mastery, targets, df["student_id"], max_len=max_len)
+    loader = DataLoader(
+        dataset,
+        batch_sampler=BucketBatchSampler(dataset.lengths, batch_size),
+        collate_fn=pad_collate,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+    )
+    print(f"[INFO] {len(dataset)} sequences from {len(df)} interactions")
 
-    model = AKT(num_concepts=df["concept_id_encoded"].nunique())
-    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    model = AKT(num_concepts=len(vocabs["concepts"]))
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
     loss_fn = torch.nn.BCELoss()
 
-    for epoch in range(3):
+    for epoch in range(epochs):
         total_loss = 0
-        for c, r, m in loader:
-            pred = model(c, r, m)
-            loss = loss_fn(pred.squeeze().float(), r.squeeze().float())
+        for c, r, m, y, padding in loader:
+            pred = model(c, r, m, key_padding_mask=padding, causal=True).squeeze(-1)
+            valid = ~padding
+            loss = loss_fn(pred[valid], y[valid])
 
             optimizer.zero_grad()
             loss.backward()
@@ -54,8 +130,20 @@ def train_akt():
         print(f"Epoch {epoch+1}, Loss: {total_loss:.4f}")
 
     torch.save(model.state_dict(), "models/akt.pt")
+    save_vocabs(vocab_path, **vocabs)
     print("AKT training complete")
 
 
+def _cli():
+    p = argparse.ArgumentParser()
+    p.add_argument("--epochs", type=int, default=3)
+    p.add_argument("--batch-size", type=int, default=64, help="Sequences per batch")
+    p.add_argument("--max-len", type=int, default=200, help="Longer histories are split into windows")
+    p.add_argument("--workers", type=int, default=2, help="DataLoader worker processes")
+    args = p.parse_args()
+
+    train_akt(epochs=args.epochs, batch_size=args.batch_size, max_len=args.max_len, num_workers=args.workers)
+
+
 if __name__ == "__main__":
-    train_akt()
+    _cli()
@@ -1,6 +1,9 @@
+from pathlib import Path
+
 import torch
 from torch.utils.data import DataLoader, Dataset
 from src.models.ncf import NCF
+from src.models.vocab import load_or_create, save_vocabs
 from src.storage.feature_store import FeatureStore
 
 
@@ -24,23 +27,26 @@ class InteractionDataset(Dataset):
 
 def train_ncf():
     fs = FeatureStore()
-    df = fs.interactions.copy()
+    df = fs.query(columns=["student_id", "concept_id", "is_correct"])
 
     if df.empty:
         print("[WARN] No interaction data found — skipping NCF training.")
         return None
 
     # Demo-safe resource IDs
-    df["resource_id"] = df["concept_id"].astype(str)
+    df["resource_id"] = df["concept_id"]
 
-    df["student_id_encoded"] = df["student_id"].astype("category").cat.codes
-    df["resource_id_encoded"] = df["resource_id"].astype("category").cat.codes
+    # stable codes: previously seen ids keep their code, new ids are appended
+    vocab_path = Path("models/ncf_vocab.json")
+    vocabs = load_or_create(vocab_path, users=df["student_id"], items=df["resource_id"])
+    df["student_id_encoded"] = vocabs["users"].encode(df["student_id"])
+    df["resource_id_encoded"] = vocabs["items"].encode(df["resource_id"])
 
     dataset = InteractionDataset(df)
     loader = DataLoader(dataset, batch_size=32, shuffle=True)
 
-    num_users = df["student_id_encoded"].nunique()
-    num_items = df["resource_id_encoded"].nunique()
+    num_users = len(vocabs["users"])
+    num_items = len(vocabs["items"])
 
     model = NCF(num_users=num_users, num_items=num_items)
 
@@ -66,6 +72,8 @@ def train_ncf():
 
         print(f"Epoch {epoch+1}, Loss: {total_loss:.4f}")
 
+    torch.save(model.state_dict(), "models/ncf.pt")
+    save_vocabs(vocab_path, **vocabs)
     print("NCF training complete")
 
     return model
@@ -1,18 +1,19 @@
+from pathlib import Path
+
 import pandas as pd
-import shap
 from src.models.risk_xgb import RiskModel
 from src.storage.feature_store import FeatureStore
+from src.storage.student_features import RISK_FEATURES
+
+RISK_MODEL_PATH = Path("models/risk_xgb.ubj")
 
 
 def train_risk_model():
     fs = FeatureStore()
 
-    # Aggregate per student
-    df = fs.interactions.groupby("student_id").agg(
-        avg_time_spent=("time_spent", "mean"),
-        total_interactions=("time_spent", "count"),
-        correct_rate=("is_correct", "mean"),
-    ).reset_index()
+    # Per-student features: the same table the API serves from
+    fs.save_features()
+    df = fs.features.frame()[RISK_FEATURES].reset_index()
 
     # Debug prints
     print("[DEBUG] Aggregated df head:\n", df.head())
@@ -64,12 +65,14 @@ def train_risk_model():
     model = RiskModel()
     model.train(X, y)
 
-    explainer = shap.Explainer(model.model, X)
-    shap_values = explainer(X)
-
-    print("Risk model trained")
+    model.save(RISK_MODEL_PATH)
+    print(f"Risk model trained, saved to {RISK_MODEL_PATH}")
+    # TreeSHAP for one row only; attributions for everyone come from explain_risk
+    contribs, base = model.explain(X.iloc[:1])
     print("Sample SHAP explanation:")
-    print(shap_values[0])
+    print(f"  base value: {base[0]:.4f}")
+    for name, value in zip(model.features, contribs[0]):
+        print(f"  {name}: {value:+.4f}")
 
     return model
 
@@ -1,73 +1,121 @@
 import argparse
-import numpy as np
+import itertools
+import time
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 from src.models.rl_agent import LinUCB
 from src.storage.feature_store import FeatureStore
+from src.storage.policy_store import PolicyStore
+from src.storage.student_features import ENGAGEMENT_FEATURES, StudentFeatures
 
+CONTEXT_DIM = 6
+N_ACTIONS = 5
 
-def train_rl(epochs: int = 1, demo_size: int = 30, seed: int | None = 42):
-    fs = FeatureStore()
 
-    # Simulated state vector per student
-    students = list(fs.interactions["student_id"].unique())
+def build_contexts(interactions):
+    """Engagement features of every student as an [n_students, 4] array.
 
-    context_dim = 6
-    n_actions = 5
+    One grouped pass through the shared per-student feature table, in order
+    of first appearance.
+    """
+    features = StudentFeatures.from_interactions(interactions)
+    return features.frame(pd.unique(interactions["student_id"]))[ENGAGEMENT_FEATURES].to_numpy(dtype=float)
 
-    agent = LinUCB(n_actions=n_actions, context_dim=context_dim)
 
-    rng = np.random.RandomState(seed)
+def demo_contexts(n, rng):
+    """Synthetic engagement features for `n` demo students."""
+    return np.column_stack([
+        rng.randint(1, 50, size=n),
+        rng.uniform(0.5, 10.0, size=n),
+        rng.randint(1, 30, size=n),
+        rng.uniform(0.0, 10.0, size=n),
+    ]).astype(float)
+
 
-    # Track actions across all epochs
-    actions_taken = []
-    last_action = None
+def simulate(features, epochs=1, seed=42, alpha=1.0, batch_size=64, min_rounds=None):
+    """Run the simulated bandit over all students, `batch_size` students per round.
 
-    # If too few students, we'll create a reproducible demo set later
-    if len(students) < 2:
-        students = None
+    Each round scores every student in it with one `select_actions` call and
+    applies all their rewards with one `update_batch`, so feedback is delayed
+    by at most one round. batch_size=1 reproduces the sequential loop. With
+    `min_rounds`, rounds shrink so each epoch has at least that many, so a
+    small set still gets feedback before most of its decisions.
+    Returns (agent, actions taken, total reward).
+    """
+    rng = np.random.RandomState(seed)
+    agent = LinUCB(n_actions=N_ACTIONS, context_dim=CONTEXT_DIM, alpha=alpha)
 
+    n = len(features)
+    if min_rounds:
+        batch_size = max(1, min(batch_size, n // min_rounds))
+    actions = np.empty(epochs * n, dtype=np.int64)
+    total_reward = 0.0
     for ep in range(epochs):
-        if students is None:
-            # build reproducible demo student ids
-            students = [f"demo_{i}" for i in range(demo_size)]
-
-        for sid in students:
-            features = fs.compute_engagement_features(sid)
-            # If original FeatureStore has no data for demo ids, compute_engagement_features will return None
-            if features is None:
-                # create a synthetic feature vector for demo students
-                features = {
-                    "total_interactions": int(rng.randint(1, 50)),
-                    "avg_time_spent": float(rng.uniform(0.5, 10.0)),
-                    "active_days": int(rng.randint(1, 30)),
-                    "max_inactivity_gap": float(rng.uniform(0.0, 10.0)),
-                }
-
-            context = np.array([
-                features["total_interactions"],
-                features["avg_time_spent"],
-                features["active_days"],
-                features["max_inactivity_gap"] if features["max_inactivity_gap"] is not None else 0.0,
-                rng.rand(),  # risk score placeholder
-                rng.rand(),  # avg mastery placeholder
-            ], dtype=float)
-
-            action = agent.select_action(context)
-            last_action = action
-            actions_taken.append(action)
-
-            # Simulated reward (hackathon-safe)
-            mastery_gain = rng.uniform(0, 1)
-            engagement_gain = rng.uniform(0, 1)
-            risk_change = rng.uniform(-0.5, 0.5)
-
-            reward = mastery_gain + 0.5 * engagement_gain - risk_change
-
-            agent.update(action, context, reward)
+        # risk score and avg mastery placeholders
+        contexts = np.column_stack([features, rng.rand(n, 2)])
+        # Simulated reward (hackathon-safe): mastery gain + engagement gain - risk change
+        rewards = rng.uniform(0, 1, n) + 0.5 * rng.uniform(0, 1, n) - rng.uniform(-0.5, 0.5, n)
+
+        for start in range(0, n, batch_size):
+            x = contexts[start:start + batch_size]
+            chosen = agent.select_actions(x)
+            agent.update_batch(chosen, x, rewards[start:start + batch_size])
+            actions[ep * n + start:ep * n + start + len(x)] = chosen
+        total_reward += rewards.sum()
+
+    return agent, actions, total_reward
+
+
+def _simulate_setting(args):
+    features, setting = args
+    start = time.perf_counter()
+    _, actions, total_reward = simulate(features, **setting)
+    return {
+        **setting,
+        "mean_reward": float(total_reward / max(len(actions), 1)),
+        "actions": dict(Counter(actions.tolist())),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def run_simulations(features, settings, n_jobs=1):
+    """Evaluate independent settings (seed, alpha, ...) in parallel processes."""
+    jobs = [(features, s) for s in settings]
+    if n_jobs <= 1 or len(jobs) <= 1:
+        return [_simulate_setting(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        return list(pool.map(_simulate_setting, jobs))
+
+
+def _load_features(demo_size, seed):
+    fs = FeatureStore()
+    interactions = fs.query(columns=["student_id", "timestamp", "time_spent", "is_correct"])
+    fs.close()
+    # If too few students, use a reproducible demo set
+    if interactions["student_id"].nunique() < 2:
+        return demo_contexts(demo_size, np.random.RandomState(seed))
+    return build_contexts(interactions)
+
+
+def train_rl(epochs: int = 1, demo_size: int = 30, seed: int | None = 42, save: bool = False,
+             batch_size: int = 64, alpha: float = 1.0, min_rounds: int | None = None):
+    features = _load_features(demo_size, seed)
+    print(f"[INFO] Simulating {len(features)} students x {epochs} epochs")
+
+    agent, actions, _ = simulate(features, epochs=epochs, seed=seed, alpha=alpha, batch_size=batch_size,
+                                 min_rounds=min_rounds)
 
     print("RL agent training complete")
-    print("Sample selected action:", last_action)
-    print("Action distribution:", Counter(actions_taken))
+    print("Sample selected action:", int(actions[-1]) if len(actions) else None)
+    print("Action distribution:", Counter(actions.tolist()))
+
+    if save:
+        # replaces the served policy, including anything it learned online
+        PolicyStore().save(agent)
+        print("[INFO] Saved policy to the PolicyStore")
 
     return agent
 
@@ -77,9 +125,33 @@ def _cli():
     p.add_argument("--epochs", type=int, default=1, help="Number of epochs over students")
     p.add_argument("--demo-size", type=int, default=30, help="Synthetic demo student count when data is small")
     p.add_argument("--seed", type=int, default=42, help="RNG seed for reproducibility")
+    p.add_argument("--batch-size", type=int, default=64, help="Students per vectorized bandit round")
+    p.add_argument("--min-rounds", type=int, default=None,
+                   help="Lower --batch-size to len(students) // N so each epoch has at least N rounds (off by default)")
+    p.add_argument("--alpha", type=float, default=1.0, help="LinUCB exploration weight")
+    p.add_argument("--save", action="store_true", help="Overwrite the served (online) policy with this one")
+    p.add_argument("--sweep-seeds", type=int, nargs="*", help="Evaluate these seeds instead of training")
+    p.add_argument("--sweep-alphas", type=float, nargs="*", help="Evaluate these alphas instead of training")
+    p.add_argument("--jobs", type=int, default=1, help="Worker processes for sweeps")
     args = p.parse_args()
 
-    train_rl(epochs=args.epochs, demo_size=args.demo_size, seed=args.seed)
+    if args.sweep_seeds or args.sweep_alphas:
+        features = _load_features(args.demo_size, args.seed)
+        settings = [
+            {"seed": s, "alpha": a, "epochs": args.epochs, "batch_size": args.batch_size,
+             "min_rounds": args.min_rounds}
+            for s, a in itertools.product(args.sweep_seeds or [args.seed], args.sweep_alphas or [args.alpha])
+        ]
+        for result in run_simulations(features, settings, n_jobs=args.jobs):
+            print(
+                f"[INFO] seed={result['seed']} alpha={result['alpha']}: "
+                f"mean reward {result['mean_reward']:.4f}, actions {result['actions']} "
+                f"({result['seconds']:.1f}s)"
+            )
+        return
+
+    train_rl(epochs=args.epochs, demo_size=args.demo_size, seed=args.seed, save=args.save,
+             batch_size=args.batch_size, alpha=args.alpha, min_rounds=args.min_rounds)
 
 
 if __name__ == "__main__":
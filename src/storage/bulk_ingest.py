@@ -0,0 +1,100 @@
+import io
+import json
+
+import pandas as pd
+
+from data.schemas.interaction_schema import validate_events
+
+BULK_BATCH_ROWS = 10_000
+# Identifier fields; numeric JSON ids must reach validation as ints, never floats
+ID_COLUMNS = ["student_id", "concept_id", "activity_id"]
+
+
+def read_ndjson(data, first_line=0):
+    """Parse newline-delimited JSON records into a frame.
+
+    Returns (records, errors); `errors` lists unparseable lines as
+    {"line", "reason"} and the frame keeps each record's line number in
+    `_line`. The whole chunk is parsed in one call unless it has bad lines
+    or a numeric id column with gaps, which pandas would turn into floats
+    (student 123 stored as "123.0").
+    """
+    lines = data.split(b"\n")
+    numbers = [first_line + k for k, l in enumerate(lines) if l.strip()]
+    lines = [l for l in lines if l.strip()]
+    if not lines:
+        return pd.DataFrame(), []
+    try:
+        records = pd.read_json(io.BytesIO(b"\n".join(lines)), lines=True, dtype=False, convert_dates=False)
+        floats = any(records[c].dtype.kind == "f" for c in ID_COLUMNS if c in records.columns)
+        if len(records) == len(lines) and not floats:
+            return records.assign(_line=numbers), []
+    except ValueError:
+        pass
+
+    # slow path: find the bad lines, keep every value as parsed
+    parsed, kept, errors = [], [], []
+    for number, line in zip(numbers, lines):
+        try:
+            value = json.loads(line)
+            if not isinstance(value, dict):
+                raise ValueError("not a JSON object")
+            parsed.append(value)
+            kept.append(number)
+        except ValueError as e:
+            errors.append({"line": number, "reason": f"invalid JSON: {e}"})
+    return pd.DataFrame(parsed, dtype=object).assign(_line=kept), errors
+
+
+def ingest_events(events, fs, bkt):
+    """Apply validated InteractionEvents to storage and BKT state in one batch.
+
+    Rows are appended as one group commit. Learners with stored mastery
+    continue from it (one vectorized BKT scan seeded with their current
+    values); learners seen for the first time are replayed from their full
+    history, as `/interact` would. Events are applied in timestamp order
+    after what is already stored.
+    """
+    if events.empty:
+        return 0
+    events = events.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    fs.append_events(events)
+
+    store = bkt.store
+    students = events["student_id"].unique()
+    stored = store.get_students(students)
+    continuing = events["student_id"].map(lambda s: bool(stored[s])).to_numpy()
+
+    part = events[continuing]
+    if len(part):
+        initial = [stored[s].get(c, bkt.p_init) for s, c in zip(part["student_id"], part["concept_id"])]
+        mastery = bkt.batch_mastery(part["student_id"], part["concept_id"], part["is_correct"], initial=initial)
+        final = pd.DataFrame({"s": part["student_id"], "c": part["concept_id"], "m": mastery}).groupby(["s", "c"], sort=False)
+        store.apply_many((s, c, p, n) for ((s, c), p), n in zip(final["m"].last().items(), final.size()))
+
+    new = events[~continuing]
+    if len(new):
+        # learners whose whole history is this batch need no store read
+        counts = new["student_id"].value_counts()
+        older = [s for s, n in counts.items() if fs.history_length(s) != n]
+        history = pd.concat(
+            [new[~new["student_id"].isin(older)]] + [fs.get_student_df(s) for s in older],
+            ignore_index=True,
+        )
+        history["concept_id"] = history["concept_id"].astype(str)
+        mastery = bkt.batch_mastery(history["student_id"], history["concept_id"], history["is_correct"])
+        final = pd.DataFrame({"s": history["student_id"], "c": history["concept_id"], "m": mastery}).groupby(["s", "c"], sort=False)
+        store.set_many((s, c, p, n) for ((s, c), p), n in zip(final["m"].last().items(), final.size()))
+
+    return len(events)
+
+
+def ingest_ndjson(data, fs, bkt, first_line=0):
+    """Parse, validate and apply one chunk of NDJSON. Returns (accepted, errors)."""
+    records, errors = read_ndjson(data, first_line)
+    if records.empty:
+        return 0, errors
+    lines = records.pop("_line").to_numpy()
+    events, rejected = validate_events(records)
+    errors += [{"line": int(lines[i]), "reason": r} for i, r in zip(rejected["index"], rejected["reason"])]
+    return ingest_events(events, fs, bkt), sorted(errors, key=lambda e: e["line"])
@@ -1,44 +1,288 @@
+import threading
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from data.schemas.interaction_schema import DIFFICULTY_LEVELS, as_strings
+from src.storage.interaction_log import CATEGORY_COLUMNS, InteractionLog, compact_frame, concat_frames, rows_to_frame
+from src.storage.student_features import ENGAGEMENT_FEATURES, StudentFeatures
+
 DATA_PATH = Path("data/processed")
 
+COMPACT_INTERVAL_SECONDS = 300
+
+
+def normalize_student_id(student_id):
+    """Student ids are stored as strings; API callers often pass ints."""
+    return str(student_id)
+
 
 class FeatureStore:
-    def __init__(self):
-        self.interactions = pd.read_parquet(
-            DATA_PATH / "interactions.parquet"
-        )
-        self.interactions["timestamp"] = pd.to_datetime(
-            self.interactions["timestamp"]
-        )
+    """Interactions plus the per-student feature table, shared by serving and pipelines.
+
+    Startup reads only the persisted feature table and the write-ahead
+    segments; compacted interactions stay on disk (memory-mapped parquet)
+    and are scanned per student, with filters pushed down, until something
+    asks for the whole frame (`interactions`), which is then loaded once.
+    Rows not yet compacted are held in memory (`_pending`, tagged with
+    their segment) and dropped once a compaction has moved them to disk.
+    """
+
+    def __init__(self, data_path=DATA_PATH):
+        self._lock = threading.RLock()
+        self.log = InteractionLog(data_path)
+        self.features_path = Path(data_path) / "student_features.parquet"
+        self._compactor = None
+        self._load()
+
+    def _load(self):
+        self._dataset, tail = self.log.snapshot()
+        self._frame = None
+        self._index = {}
+        # rows of segments not yet compacted, their segment ids, and how many
+        # of them (from the front) are already folded into the frame
+        self._pending = []
+        self._pending_segments = []
+        self._folded = 0
+        # rows not yet in the frame, by student
+        self._pending_by_student = {}
+        self._n_rows = self._dataset.count_rows()
+        # a persisted table covers the segment rows too; a rebuild reads them from the frame
+        for segment, rows in tail.items():
+            self._add_pending(rows, segment, update_features=False)
+
+        self.features = self._load_features(self._n_rows)
+        if self.features is None:
+            # no usable feature table: load everything once and rebuild it
+            self.features = StudentFeatures.from_interactions(self.interactions)
+
+    def _load_features(self, n_rows):
+        """Persisted feature table if it covers exactly `n_rows` interactions."""
+        if self.features_path.exists():
+            try:
+                features, saved_rows = StudentFeatures.load(self.features_path)
+                if saved_rows == n_rows:
+                    return features
+            except Exception as e:
+                print(f"[WARN] Could not load {self.features_path}: {e}")
+        return None
+
+    @staticmethod
+    def _build_index(frame, offset=0):
+        """Map student id -> time-sorted row positions in `frame` (shifted by `offset`)."""
+        order = np.argsort(frame["timestamp"].to_numpy(), kind="stable")
+        ids = frame["student_id"]
+        # group on the dictionary codes, not the strings
+        groups = pd.Series(order).groupby(ids.cat.codes.to_numpy()[order], sort=False).indices
+        names = ids.cat.categories
+        return {names[code]: order[pos] + offset for code, pos in groups.items()}
+
+    def _add_pending(self, rows, segment, update_features=True):
+        late = set()
+        self._pending_segments.extend([segment] * len(rows))
+        for row in rows:
+            row["student_id"] = normalize_student_id(row["student_id"])
+            self._pending.append(row)
+            self._pending_by_student.setdefault(row["student_id"], []).append(row)
+            self._n_rows += 1
+            if update_features and row["student_id"] not in late and not self.features.add(row):
+                late.add(row["student_id"])
+        for sid in late:
+            # late event: the running gap statistics need the whole history
+            self.features.set_student(sid, self.get_student_df(sid))
+
+    @property
+    def interactions(self):
+        """All interactions; loaded on first access, later rows folded in lazily.
+
+        The frame is compact (see `compact_frame`): categorical strings with
+        codes that stay stable as rows are folded in, and narrow numerics.
+        """
+        with self._lock:
+            if self._frame is None:
+                self._frame = self._dataset.scan(compact=True)
+                self._index = self._build_index(self._frame)
+            if self._folded < len(self._pending):
+                new_df = compact_frame(rows_to_frame(self._pending[self._folded:]))
+                offset = len(self._frame)
+                self._frame = concat_frames([self._frame, new_df])
+
+                ts = self._frame["timestamp"].to_numpy()
+                for sid, new_pos in self._build_index(new_df, offset).items():
+                    pos = self._index.get(sid)
+                    if pos is None:
+                        self._index[sid] = new_pos
+                        continue
+                    pos = np.concatenate([pos, new_pos])
+                    if ts[new_pos[0]] < ts[pos[len(pos) - len(new_pos) - 1]]:
+                        # late-arriving event: restore time order for this student only
+                        pos = pos[np.argsort(ts[pos], kind="stable")]
+                    self._index[sid] = pos
+
+                self._folded = len(self._pending)
+                self._pending_by_student = {}
+            return self._frame
+
+    def query(self, columns=None, student_ids=None, start=None, end=None):
+        """Interactions filtered by student ids and/or timestamp in [start, end).
+
+        Before the full frame is loaded only the requested columns and the
+        matching row groups are read from disk, plus matching rows not yet
+        compacted. Returns a compact frame.
+        """
+        with self._lock:
+            frame, dataset, pending = self._frame, self._dataset, list(self._pending)
+        if frame is not None:
+            # already in memory
+            df = self.interactions
+            mask = pd.Series(True, index=df.index)
+            if student_ids is not None:
+                mask &= df["student_id"].isin([normalize_student_id(s) for s in student_ids])
+            if start is not None:
+                mask &= df["timestamp"] >= pd.Timestamp(start)
+            if end is not None:
+                mask &= df["timestamp"] < pd.Timestamp(end)
+            df = df[mask]
+            return (df if columns is None else df[columns]).reset_index(drop=True)
+
+        df = dataset.scan(columns, student_ids, start, end, compact=True)
+        if pending:
+            new = compact_frame(rows_to_frame(pending))
+            if student_ids is not None:
+                new = new[new["student_id"].isin([normalize_student_id(s) for s in student_ids])]
+            if start is not None:
+                new = new[new["timestamp"] >= pd.Timestamp(start)]
+            if end is not None:
+                new = new[new["timestamp"] < pd.Timestamp(end)]
+            if not new.empty:
+                new = new if columns is None else new[columns]
+                df = concat_frames([df, new])
+        return df
+
+    def refresh(self):
+        """Pick up interactions written by other processes since the last read."""
+        with self._lock:
+            changes = self.log.read_new()
+            if changes is None:
+                # base snapshot rewritten: nothing we hold is comparable any more
+                self._load()
+                return
+            dataset, tail, compacted, missed = changes
+            for segment, rows in tail.items():
+                self._add_pending(rows, segment)
+            if dataset is not None:
+                self._advance(dataset, compacted, missed)
+
+    def _advance(self, dataset, compacted, missed):
+        """Switch to a re-opened dataset that now holds the `compacted` segments."""
+        if self._frame is not None and not missed:
+            # the frame keeps serving; it must hold the rows about to leave `_pending`
+            self.interactions
+        keep = [k for k, segment in enumerate(self._pending_segments) if segment not in compacted]
+        self._folded = sum(1 for k in keep if k < self._folded)
+        self._pending = [self._pending[k] for k in keep]
+        self._pending_segments = [self._pending_segments[k] for k in keep]
+        self._dataset = dataset
+
+        if missed:
+            # another process compacted rows before we read them from its
+            # segment; they are only in the dataset now. Go back to lazy
+            # reads (the frame lacks them) and recompute those students.
+            self._frame = None
+            self._index = {}
+            self._folded = 0
+            students = {sid for claim in missed for sid in self.log.claim_students(claim)}
+            if students:
+                history = dataset.scan(columns=["student_id", "timestamp", "time_spent", "is_correct"], student_ids=students)
+                extra = [row for row in self._pending if row["student_id"] in students]
+                if extra:
+                    history = pd.concat([history, rows_to_frame(extra)[history.columns]], ignore_index=True)
+                self.features.set_students(history)
+
+        self._pending_by_student = {}
+        for row in self._pending[self._folded:]:
+            self._pending_by_student.setdefault(row["student_id"], []).append(row)
+        self._n_rows = dataset.count_rows() + len(self._pending)
+
+    def compact(self):
+        """Fold sealed write-ahead segments into parquet parts."""
+        with self._lock:
+            # make sure every byte we are about to compact is already in memory
+            self.refresh()
+            n = self.log.compact()
+            # drop the compacted rows from memory and read from the new parts
+            self.refresh()
+            self.save_features()
+            return n
+
+    def save_features(self):
+        """Persist the per-student feature table for the next startup and training."""
+        with self._lock:
+            self.features.save(self.features_path, self._n_rows)
+
+    def get_features(self, student_ids):
+        """Feature rows (FEATURE_COLUMNS) for many students, O(1) each."""
+        with self._lock:
+            return self.features.frame([normalize_student_id(s) for s in student_ids])
+
+    def start_compaction(self, interval=COMPACT_INTERVAL_SECONDS):
+        """Run `compact()` every `interval` seconds on a daemon thread."""
+        if self._compactor is not None:
+            return
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    n = self.compact()
+                    if n:
+                        print(f"[INFO] Compacted {n} interactions")
+                except Exception as e:
+                    print(f"[WARN] Compaction failed: {e}")
+
+        self._compactor = stop
+        threading.Thread(target=loop, name="feature-store-compactor", daemon=True).start()
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.set()
+            self._compactor = None
+        self.log.close()
 
     def get_student_df(self, student_id):
-        return (
-            self.interactions[
-                self.interactions["student_id"] == student_id
-            ]
-            .sort_values("timestamp")
-            .reset_index(drop=True)
-        )
+        """Time-sorted history of one student; cost scales with that history only."""
+        sid = normalize_student_id(student_id)
+        with self._lock:
+            extra = list(self._pending_by_student.get(sid, ()))
+            if self._frame is not None:
+                pos = self._index.get(sid)
+                df = self._frame.iloc[pos] if pos is not None else self._frame.iloc[:0]
+            else:
+                df, dataset = None, self._dataset
+        if df is None:
+            # frame not loaded: read just this student's bucket and row groups
+            df = dataset.scan(student_ids=[sid])
+        if extra:
+            df = pd.concat([df, rows_to_frame(extra)], ignore_index=True, sort=False)
+        # small per-student frame: plain strings (not the shared dictionaries),
+        # missing as None whichever path the rows came from
+        df = df.assign(**{col: as_strings(df[col]) for col in CATEGORY_COLUMNS})
+        if not df["timestamp"].is_monotonic_increasing:
+            df = df.sort_values("timestamp", kind="stable")
+        return df.reset_index(drop=True)
 
-    def compute_engagement_features(self, student_id):
-        df = self.get_student_df(student_id)
+    def history_length(self, student_id):
+        """Number of stored interactions for a student, O(1)."""
+        with self._lock:
+            return self.features.count(normalize_student_id(student_id))
 
-        if df.empty:
+    def compute_engagement_features(self, student_id):
+        with self._lock:
+            features = self.features.get(normalize_student_id(student_id))
+        if features is None:
             return None
-
-        return {
-            "total_interactions": len(df),
-            "avg_time_spent": df["time_spent"].mean(),
-            "active_days": (
-                df["timestamp"].max() - df["timestamp"].min()
-            ).days
-            + 1,
-            "max_inactivity_gap": (
-                df["timestamp"].diff().dt.days.max()
-            ),
-        }
+        return {name: features[name] for name in ENGAGEMENT_FEATURES}
 
     def record_interaction(
         self,
@@ -50,28 +294,64 @@ class FeatureStore:
         difficulty: str = "medium",
         timestamp=None,
     ):
-        """Append a new interaction to the in-memory DataFrame and persist to parquet.
+        """Append a new interaction to the write-ahead log and the in-memory view.
 
-        This is a simple, robust append used for demo/testing. It does not enforce
+        The write is O(1): one line appended to this process's active segment.
+        Segments are folded into parquet by `compact()`. It does not enforce
         strict schema beyond required fields.
         """
+        row = self._make_row(student_id, concept_id, is_correct, time_spent, activity_type, difficulty, timestamp)
+        with self._lock:
+            segment = self.log.append_many([row])
+            self._add_pending([row], segment)
+
+        return row
+
+    def record_interactions(self, events, sync=True):
+        """Group commit: append many interactions (dicts of `record_interaction`
+        arguments) with one write and, with `sync`, one fsync. Returns the rows."""
+        rows = [self._make_row(**event) for event in events]
+        with self._lock:
+            segment = self.log.append_many(rows, sync=sync)
+            self._add_pending(rows, segment)
+        return rows
+
+    def append_events(self, events, sync=True):
+        """Append a validated InteractionEvent frame (see `validate_events`) as one group commit."""
+        rows = events.to_dict("records")
+        with self._lock:
+            segment = self.log.append_many(rows, sync=sync)
+            self._add_pending(rows, segment)
+        return len(rows)
+
+    @staticmethod
+    def _make_row(
+        student_id,
+        concept_id,
+        is_correct,
+        time_spent=0.0,
+        activity_type="practice",
+        difficulty="medium",
+        timestamp=None,
+    ):
         if timestamp is None:
             timestamp = pd.Timestamp.now()
 
         # normalize difficulty to numeric for compatibility with existing parquet
         if isinstance(difficulty, str):
-            diff_map = {"easy": 0.25, "medium": 0.5, "hard": 0.75, "reinforce": 0.0, "mixed": 0.5}
-            difficulty_val = diff_map.get(difficulty.lower(), 0.5)
+            difficulty_val = DIFFICULTY_LEVELS.get(difficulty.lower(), 0.5)
         else:
             try:
                 difficulty_val = float(difficulty)
             except Exception:
                 difficulty_val = 0.5
 
-        row = {
-            "student_id": str(student_id),
+        return {
+            "student_id": normalize_student_id(student_id),
             "timestamp": pd.to_datetime(timestamp),
-            "activity_id": f"auto_{student_id}_{int(pd.Timestamp.now().timestamp())}",
+            # no real activity behind an API event; a per-event id would only
+            # defeat the dictionary encoding of the column
+            "activity_id": None,
             "concept_id": concept_id,
             "is_correct": int(bool(is_correct)),
             "attempts": int(1),
@@ -79,19 +359,3 @@ class FeatureStore:
             "activity_type": activity_type,
             "difficulty": float(difficulty_val),
         }
-
-        new_df = pd.DataFrame([row])
-        # maintain same columns order by concatenating
-        self.interactions = pd.concat([self.interactions, new_df], ignore_index=True, sort=False)
-
-        # ensure consistent dtypes (student_id as string) to avoid parquet conversion errors
-        try:
-            self.interactions["student_id"] = self.interactions["student_id"].astype(str)
-        except Exception:
-            pass
-
-        # persist
-        (DATA_PATH / "interactions.parquet").parent.mkdir(parents=True, exist_ok=True)
-        self.interactions.to_parquet(DATA_PATH / "interactions.parquet", index=False)
-
-        return row
@@ -0,0 +1,555 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api.types import union_categoricals
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
+
+from data.schemas.interaction_schema import COLUMNS, as_strings
+
+N_BUCKETS = 16
+SEGMENT_MAX_ROWS = 10_000
+STALE_CLAIM_SECONDS = 3600
+
+# Typed on-disk schema of compacted interactions (timestamps stored natively)
+ARROW_SCHEMA = pa.schema([
+    ("student_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("activity_id", pa.string()),
+    ("concept_id", pa.string()),
+    ("is_correct", pa.int64()),
+    ("attempts", pa.int64()),
+    ("time_spent", pa.float64()),
+    ("activity_type", pa.string()),
+    ("difficulty", pa.float64()),
+])
+# Parts are sorted by (student_id, timestamp) and written in row groups of
+# this size, so row-group statistics narrow a per-student read to a few
+# small groups
+ROW_GROUP_ROWS = 2_048
+# Claim prefix of parts rewritten from the base snapshot by `partition_base`
+BASE_CLAIM = "base-"
+
+# In-memory representation: dictionary-encoded strings and narrow numerics.
+# Timestamps stay datetime64, which is already an int64 epoch underneath.
+CATEGORY_COLUMNS = ["student_id", "activity_id", "concept_id", "activity_type"]
+COMPACT_DTYPES = {"is_correct": "int8", "attempts": "int32", "time_spent": "float32", "difficulty": "float32"}
+
+
+def student_bucket(student_id, n_buckets=N_BUCKETS):
+    """Stable hash partition for a student id (same across processes/runs)."""
+    return zlib.crc32(str(student_id).encode("utf-8")) % n_buckets
+
+
+def rows_to_frame(rows):
+    """Build a typed interactions frame from appended row dicts."""
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+    df["student_id"] = df["student_id"].astype(str)
+    return df
+
+
+def compact_frame(df):
+    """Interactions with categorical string columns and narrow numeric dtypes."""
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if col in CATEGORY_COLUMNS:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = as_strings(values).astype("category")
+        elif col in COMPACT_DTYPES:
+            values = values.astype(COMPACT_DTYPES[col])
+        out[col] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def concat_frames(frames):
+    """Concatenate compact frames, unioning categories.
+
+    Categories of the first frame keep their codes and new values are
+    appended after them, so codes stay stable as rows are folded in.
+    """
+    frames = [f for f in frames if len(f)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    cats = [c for c in frames[0].columns if isinstance(frames[0][c].dtype, pd.CategoricalDtype)]
+    out = pd.concat([f.drop(columns=cats) for f in frames], ignore_index=True, sort=False)
+    for col in cats:
+        out[col] = union_categoricals([f[col] for f in frames])
+    return out[frames[0].columns]
+
+
+def frame_to_table(df):
+    """Typed, (student_id, timestamp)-sorted Arrow table of an interactions frame."""
+    df = df.sort_values(["student_id", "timestamp"], kind="stable")
+    df = df.assign(**{col: as_strings(df[col]) for col in CATEGORY_COLUMNS})
+    return pa.Table.from_pandas(df[COLUMNS], schema=ARROW_SCHEMA, preserve_index=False)
+
+
+def _compact_table(table):
+    # dictionary-encode in Arrow so pandas receives categoricals without
+    # ever materializing a full string column
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if name in CATEGORY_COLUMNS:
+            column = pc.dictionary_encode(column)
+        elif name in COMPACT_DTYPES:
+            column = column.cast(pa.from_numpy_dtype(np.dtype(COMPACT_DTYPES[name])))
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+def _write_part(table, path):
+    tmp = path.with_name(f".{path.name}.tmp")
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp, path)
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _segment_id(path):
+    # seg-<pid>-<hex>.open / .jsonl / .<claim>.compacting -> seg-<pid>-<hex>
+    return path.name.split(".", 1)[0]
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION; fails once the process is gone
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+class InteractionDataset:
+    """Compacted interactions (base snapshot + committed parts) as of one read.
+
+    A pyarrow dataset over memory-mapped parquet files; nothing is loaded
+    until `scan`. Column projection and student/time filters are pushed
+    down to the files: parts are bucketed by student hash and sorted, so a
+    per-student scan opens one bucket and only the row groups whose
+    statistics can match.
+    """
+
+    def __init__(self, base=None, parts=None):
+        self.base = base
+        self.parts = parts or {}
+        self._fs = pafs.LocalFileSystem(use_mmap=True)
+        self._datasets = {}
+
+    def _dataset(self, buckets=None):
+        key = None if buckets is None else tuple(sorted(buckets))
+        dataset = self._datasets.get(key)
+        if dataset is None:
+            files = [self.base] if self.base is not None else []
+            for bucket in sorted(self.parts if buckets is None else buckets):
+                files.extend(self.parts.get(bucket, ()))
+            dataset = ds.dataset([str(f) for f in files], schema=ARROW_SCHEMA, format="parquet", filesystem=self._fs)
+            if key is None or len(key) == 1:
+                # the whole dataset and single buckets are reused by every query
+                self._datasets[key] = dataset
+        return dataset
+
+    def count_rows(self):
+        """Row count from parquet metadata; reads no data pages."""
+        return self._dataset().count_rows()
+
+    def scan(self, columns=None, student_ids=None, start=None, end=None, compact=False):
+        """Rows matching the filters as a typed frame.
+
+        `student_ids` restricts to those students, `start`/`end` to
+        timestamps in [start, end); `columns` selects what is read at all.
+        With `compact` the frame uses the dtypes of `compact_frame`.
+        """
+        buckets, expr = None, None
+        if student_ids is not None:
+            ids = sorted({str(s) for s in student_ids})
+            buckets = {student_bucket(s) for s in ids}
+            expr = ds.field("student_id") == ids[0] if len(ids) == 1 else ds.field("student_id").isin(ids)
+        if start is not None:
+            bound = ds.field("timestamp") >= pa.scalar(pd.Timestamp(start), type=pa.timestamp("us"))
+            expr = bound if expr is None else expr & bound
+        if end is not None:
+            bound = ds.field("timestamp") < pa.scalar(pd.Timestamp(end), type=pa.timestamp("us"))
+            expr = bound if expr is None else expr & bound
+        table = self._dataset(buckets).to_table(columns=columns, filter=expr)
+        return (_compact_table(table) if compact else table).to_pandas()
+
+
+class InteractionLog:
+    """Append-only, partitioned storage for interactions.
+
+    Layout under `root`:
+        interactions.parquet                  base snapshot (ingest output, until partitioned)
+        interactions_wal/<seg>.open           active segment of a live writer (JSON lines)
+        interactions_wal/<seg>.jsonl          sealed segment waiting for compaction
+        interactions_wal/<seg>.<claim>.compacting   segment claimed by a compaction
+        interactions_parts/bucket=NN/part-<claim>.parquet   compacted rows by student hash,
+                                              sorted by (student_id, timestamp)
+        interactions_parts/_committed/<claim>.json          compaction commit markers
+
+    A write appends one line to this process's active segment, so it costs
+    O(1) regardless of how many rows are stored. Compaction claims sealed
+    segments with an atomic rename (safe with several writer processes),
+    writes them out as parquet parts and only then commits a marker, so a
+    crash at any point never loses or duplicates rows for readers; the
+    active segment of a writer that died is sealed by the next compaction.
+    Parts from `partition_base` (claims "base-*") stand in for the base
+    snapshot once it is gone and are ignored while it exists.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.base_path = self.root / "interactions.parquet"
+        self.wal_dir = self.root / "interactions_wal"
+        self.parts_dir = self.root / "interactions_parts"
+        self.commit_dir = self.parts_dir / "_committed"
+
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_rows = 0
+
+        # reader state: bytes consumed per segment, known commits, base mtime
+        self._offsets = {}
+        self._commits = set()
+        self._base_mtime = None
+
+    # ---------------------------------------------------------------- reads
+
+    def _committed(self):
+        if not self.commit_dir.exists():
+            return {}
+        out = {}
+        for p in self.commit_dir.glob("*.json"):
+            try:
+                out[p.stem] = json.loads(p.read_text())
+            except (OSError, ValueError):
+                # marker being written right now; treat as not yet committed
+                continue
+        return out
+
+    def _segments(self, committed):
+        if not self.wal_dir.exists():
+            return []
+        segs = []
+        for p in self.wal_dir.iterdir():
+            if p.suffix in (".open", ".jsonl"):
+                segs.append(p)
+            elif p.suffix == ".compacting" and p.name.split(".")[1] not in committed:
+                segs.append(p)
+        return sorted(segs)
+
+    def _tail(self, path):
+        """Read complete lines appended to `path` since the last call."""
+        seg = _segment_id(path)
+        start = self._offsets.get(seg, 0)
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                chunk = f.read()
+        except FileNotFoundError:
+            # sealed/claimed between listing and reading; picked up next time
+            return []
+        end = chunk.rfind(b"\n") + 1
+        self._offsets[seg] = start + end
+        return [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+
+    def _dataset(self, committed):
+        base = self.base_path if self.base_path.exists() else None
+        parts = {}
+        # rows of the partitioned base first, so per-student reads come back time-ordered
+        for claim in sorted(committed, key=lambda c: (not c.startswith(BASE_CLAIM), c)):
+            if base is not None and claim.startswith(BASE_CLAIM):
+                continue
+            for part in self.parts_dir.glob(f"bucket=*/part-{claim}.parquet"):
+                parts.setdefault(int(part.parent.name.split("=")[1]), []).append(part)
+        return InteractionDataset(base, parts)
+
+    def _read_segments(self, committed):
+        tail = {}
+        for path in self._segments(committed):
+            rows = self._tail(path)
+            if rows:
+                tail.setdefault(_segment_id(path), []).extend(rows)
+        return tail
+
+    def snapshot(self):
+        """Reset the reader; return (dataset, rows) with the compacted
+        interactions and the rows still in write-ahead segments, as
+        {segment id: rows}."""
+        with self._lock:
+            self._offsets = {}
+            committed = self._committed()
+            self._commits = set(committed)
+            self._base_mtime = self.base_path.stat().st_mtime_ns if self.base_path.exists() else None
+            dataset = self._dataset(committed)
+            tail = self._read_segments(committed)
+        return dataset, tail
+
+    def read_all(self):
+        """Load every stored interaction (base + parts + segments)."""
+        dataset, tail = self.snapshot()
+        rows = [row for seg_rows in tail.values() for row in seg_rows]
+        frames = [dataset.scan()]
+        if rows:
+            frames.append(rows_to_frame(rows))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(frames, ignore_index=True, sort=False)
+
+    def read_new(self):
+        """Changes by other writers since the last read.
+
+        Returns (dataset, rows, compacted, missed):
+            dataset    the compacted interactions re-opened, if a compaction
+                       committed since the last read (else None)
+            rows       {segment id: rows} appended to write-ahead segments
+            compacted  ids of the segments whose rows moved into `dataset`
+            missed     claims that compacted rows this reader had not read
+                       from their segment yet; those rows are only in
+                       `dataset` (see `claim_students`)
+        or None when the base snapshot was rewritten; the caller should
+        then start over with `snapshot()`.
+        """
+        with self._lock:
+            base_mtime = self.base_path.stat().st_mtime_ns if self.base_path.exists() else None
+            if base_mtime != self._base_mtime:
+                return None
+
+            committed = self._committed()
+            compacted, missed = set(), []
+            for claim in sorted(set(committed) - self._commits):
+                for seg, size in committed[claim].items():
+                    if self._offsets.pop(seg, 0) != size:
+                        missed.append(claim)
+                    compacted.add(seg)
+                self._commits.add(claim)
+            dataset = self._dataset(committed) if compacted else None
+
+            tail = self._read_segments(committed)
+            return dataset, tail, compacted, sorted(set(missed))
+
+    def claim_students(self, claim):
+        """Student ids in the parts written by one compaction claim."""
+        files = [str(p) for p in self.parts_dir.glob(f"bucket=*/part-{claim}.parquet")]
+        if not files:
+            return []
+        table = ds.dataset(files, schema=ARROW_SCHEMA, format="parquet").to_table(columns=["student_id"])
+        return pc.unique(table["student_id"]).to_pylist()
+
+    # --------------------------------------------------------------- writes
+
+    def append(self, row):
+        """Append one interaction to this process's active segment."""
+        self.append_many([row])
+
+    def append_many(self, rows, sync=False):
+        """Append interactions with a single write; with `sync`, fsync once for all of them.
+
+        Returns the id of the segment written to.
+        """
+        data = "".join(json.dumps(row, default=_json_default) + "\n" for row in rows).encode("utf-8")
+        with self._lock:
+            if self._segment is None:
+                self.wal_dir.mkdir(parents=True, exist_ok=True)
+                name = f"seg-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+                self._segment = self.wal_dir / f"{name}.open"
+                self._segment_rows = 0
+
+            with open(self._segment, "ab") as f:
+                f.write(data)
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+                # our own rows are already in memory; don't re-read them
+                segment = _segment_id(self._segment)
+                self._offsets[segment] = f.tell()
+
+            self._segment_rows += len(rows)
+            if self._segment_rows >= SEGMENT_MAX_ROWS:
+                self._seal()
+            return segment
+
+    def _seal(self):
+        if self._segment is not None:
+            os.replace(self._segment, self._segment.with_suffix(".jsonl"))
+            self._segment = None
+            self._segment_rows = 0
+
+    def close(self):
+        """Seal the active segment so another process can compact it."""
+        with self._lock:
+            self._seal()
+
+    # ----------------------------------------------------------- compaction
+
+    def _recover(self):
+        """Tidy up after writers and compactions that crashed in another process."""
+        for path in self.wal_dir.glob("*.open"):
+            try:
+                pid = int(_segment_id(path).split("-")[1])
+            except (IndexError, ValueError):
+                continue
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            try:
+                # drop a line torn by the crash, then seal it for compaction
+                with open(path, "r+b") as f:
+                    data = f.read()
+                    f.truncate(data.rfind(b"\n") + 1)
+                os.rename(path, path.with_suffix(".jsonl"))
+            except OSError:
+                # another process sealed it first
+                continue
+
+        committed = self._committed()
+        cutoff = time.time() - STALE_CLAIM_SECONDS
+        for path in self.wal_dir.glob("*.compacting"):
+            try:
+                if path.name.split(".")[1] in committed:
+                    # rows already live in committed parts
+                    path.unlink()
+                elif path.stat().st_mtime < cutoff:
+                    # claim never committed; hand the segment back
+                    os.rename(path, path.with_name(f"{_segment_id(path)}.jsonl"))
+            except OSError:
+                continue
+
+    def compact(self):
+        """Fold sealed segments into per-bucket parquet parts.
+
+        Returns the number of rows compacted.
+        """
+        with self._lock:
+            self._seal()
+            if not self.wal_dir.exists():
+                return 0
+            self._recover()
+
+            claim = uuid.uuid4().hex[:12]
+            claimed = []
+            for path in sorted(self.wal_dir.glob("*.jsonl")):
+                target = path.with_name(f"{_segment_id(path)}.{claim}.compacting")
+                try:
+                    os.rename(path, target)
+                except OSError:
+                    # another process claimed it first
+                    continue
+                claimed.append(target)
+
+            if not claimed:
+                return 0
+
+            rows = []
+            sizes = {}
+            for path in claimed:
+                data = path.read_bytes()
+                sizes[_segment_id(path)] = len(data)
+                rows.extend(json.loads(line) for line in data.splitlines() if line.strip())
+
+            df = rows_to_frame(rows)
+            buckets = df["student_id"].map(student_bucket)
+
+            for bucket, part in df.groupby(buckets):
+                out_dir = self.parts_dir / f"bucket={bucket:02d}"
+                out_dir.mkdir(parents=True, exist_ok=True)
+                _write_part(frame_to_table(part), out_dir / f"part-{claim}.parquet")
+
+            # commit point: readers switch from the segments to the parts here
+            self.commit_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.commit_dir / f".{claim}.json.tmp"
+            tmp.write_text(json.dumps(sizes))
+            os.replace(tmp, self.commit_dir / f"{claim}.json")
+
+            for path in claimed:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+            return len(df)
+
+    def partition_base(self, batch_rows=1_000_000):
+        """Rewrite the base snapshot as bucketed, sorted parts and remove it.
+
+        Historical rows then get the same projection/predicate pushdown as
+        compacted ones. Memory is bounded by one bucket. Meant to run offline
+        right after an ingest; readers reload when the base file disappears.
+        Returns the number of rows rewritten.
+        """
+        with self._lock:
+            if not self.base_path.exists():
+                return 0
+            claim = BASE_CLAIM + uuid.uuid4().hex[:12]
+            staging = self.parts_dir / f".staging-{claim}"
+            staging.mkdir(parents=True, exist_ok=True)
+
+            # pass 1: route rows to per-bucket staging files
+            writers, buckets_of, rows = {}, {}, 0
+            try:
+                for batch in pq.ParquetFile(self.base_path).iter_batches(batch_size=batch_rows):
+                    df = batch.to_pandas()
+                    df["timestamp"] = pd.to_datetime(df["timestamp"])
+                    ids = df["student_id"].astype(str)
+                    for sid in ids.unique():
+                        if sid not in buckets_of:
+                            buckets_of[sid] = student_bucket(sid)
+                    for bucket, part in df.groupby(ids.map(buckets_of)):
+                        table = frame_to_table(part)
+                        if bucket not in writers:
+                            writers[bucket] = pq.ParquetWriter(staging / f"{bucket:02d}.parquet", ARROW_SCHEMA)
+                        writers[bucket].write_table(table)
+                    rows += len(df)
+            finally:
+                for writer in writers.values():
+                    writer.close()
+
+            # pass 2: sort each bucket and publish it
+            for bucket in writers:
+                out_dir = self.parts_dir / f"bucket={bucket:02d}"
+                out_dir.mkdir(parents=True, exist_ok=True)
+                table = pq.read_table(staging / f"{bucket:02d}.parquet")
+                table = table.sort_by([("student_id", "ascending"), ("timestamp", "ascending")])
+                _write_part(table, out_dir / f"part-{claim}.parquet")
+            shutil.rmtree(staging, ignore_errors=True)
+
+            # retire parts of an earlier partitioned base; ignored while the base exists
+            for old in self._committed():
+                if old.startswith(BASE_CLAIM):
+                    (self.commit_dir / f"{old}.json").unlink(missing_ok=True)
+                    for part in self.parts_dir.glob(f"bucket=*/part-{old}.parquet"):
+                        part.unlink(missing_ok=True)
+
+            self.commit_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.commit_dir / f".{claim}.json.tmp"
+            tmp.write_text(json.dumps({}))
+            os.replace(tmp, self.commit_dir / f"{claim}.json")
+            # switch point: from here on readers use the parts
+            self.base_path.unlink()
+            return rows
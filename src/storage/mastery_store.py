@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+from src.storage.feature_store import DATA_PATH
+
+
+class MasteryStore:
+    """Persisted BKT mastery state keyed by (student, concept).
+
+    Backed by SQLite in WAL mode so several API workers can share it. Reads
+    for one student are a primary-key range scan; an update is a single
+    read-modify-write inside an immediate transaction, so concurrent updates
+    of the same key from different processes are serialized, not lost.
+    """
+
+    def __init__(self, path=DATA_PATH / "mastery.sqlite"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS mastery ("
+            " student_id TEXT NOT NULL,"
+            " concept_id TEXT NOT NULL,"
+            " p_known REAL NOT NULL,"
+            " n_updates INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (student_id, concept_id)"
+            ") WITHOUT ROWID"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, student_id, concept_id, default=None):
+        row = self._conn().execute(
+            "SELECT p_known FROM mastery WHERE student_id = ? AND concept_id = ?",
+            (str(student_id), str(concept_id)),
+        ).fetchone()
+        return row[0] if row else default
+
+    def get_student(self, student_id):
+        """Return {concept_id: p_known} for every concept the student has seen."""
+        rows = self._conn().execute(
+            "SELECT concept_id, p_known FROM mastery WHERE student_id = ?",
+            (str(student_id),),
+        ).fetchall()
+        return dict(rows)
+
+    def get_students(self, student_ids, chunk=500):
+        """Return {student_id: {concept_id: p_known}} for many students."""
+        ids = [str(s) for s in student_ids]
+        out = {s: {} for s in ids}
+        conn = self._conn()
+        for i in range(0, len(ids), chunk):
+            batch = ids[i:i + chunk]
+            rows = conn.execute(
+                "SELECT student_id, concept_id, p_known FROM mastery"
+                f" WHERE student_id IN ({','.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+            for s, c, p in rows:
+                out[s][c] = p
+        return out
+
+    def has_student(self, student_id):
+        row = self._conn().execute(
+            "SELECT 1 FROM mastery WHERE student_id = ? LIMIT 1", (str(student_id),)
+        ).fetchone()
+        return row is not None
+
+    def update(self, student_id, concept_id, fn, default):
+        """Atomically replace p_known with fn(p_known) and return the new value."""
+        key = (str(student_id), str(concept_id))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT p_known FROM mastery WHERE student_id = ? AND concept_id = ?", key
+            ).fetchone()
+            value = float(fn(row[0] if row else default))
+            conn.execute(
+                "INSERT INTO mastery (student_id, concept_id, p_known, n_updates) VALUES (?, ?, ?, 1)"
+                " ON CONFLICT (student_id, concept_id) DO UPDATE SET"
+                " p_known = excluded.p_known, n_updates = n_updates + 1",
+                (*key, value),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def set_many(self, records):
+        """Bulk upsert of (student_id, concept_id, p_known, n_updates) tuples."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO mastery (student_id, concept_id, p_known, n_updates) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (student_id, concept_id) DO UPDATE SET"
+                " p_known = excluded.p_known, n_updates = excluded.n_updates",
+                ((str(s), str(c), float(p), int(n)) for s, c, p, n in records),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def apply_many(self, records):
+        """Bulk upsert of (student_id, concept_id, p_known, n_new) tuples that
+        continue the stored state: p_known is replaced, n_updates grows by n_new."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO mastery (student_id, concept_id, p_known, n_updates) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (student_id, concept_id) DO UPDATE SET"
+                " p_known = excluded.p_known, n_updates = n_updates + excluded.n_updates",
+                ((str(s), str(c), float(p), int(n)) for s, c, p, n in records),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
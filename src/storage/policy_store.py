@@ -0,0 +1,193 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.models.rl_agent import LinUCB
+from src.storage.feature_store import DATA_PATH, normalize_student_id
+
+DECISION_TTL_SECONDS = 24 * 3600
+
+
+def _blob(array):
+    return np.ascontiguousarray(array, dtype=np.float64).tobytes()
+
+
+def _array(blob, shape):
+    return np.frombuffer(blob, dtype=np.float64).reshape(shape).copy()
+
+
+class PolicyStore:
+    """Persisted LinUCB parameters shared by all API workers.
+
+    SQLite in WAL mode, like the MasteryStore. `/next` records the action and
+    context it chose per learner; `reward()` later credits that decision and
+    applies the LinUCB update inside an immediate transaction, so concurrent
+    updates from several workers are serialized, not lost. Every write bumps
+    a version number, which is all a worker has to poll to know its
+    in-memory copy is stale.
+    """
+
+    def __init__(self, path=DATA_PATH / "policy.sqlite"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS policy ("
+            " action INTEGER PRIMARY KEY,"
+            " context_dim INTEGER NOT NULL,"
+            " alpha REAL NOT NULL,"
+            " A BLOB NOT NULL,"
+            " A_inv BLOB NOT NULL,"
+            " b BLOB NOT NULL,"
+            " n_updates INTEGER NOT NULL DEFAULT 0"
+            ");"
+            "CREATE TABLE IF NOT EXISTS policy_version ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " version INTEGER NOT NULL"
+            ");"
+            "INSERT OR IGNORE INTO policy_version (id, version) VALUES (0, 0);"
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            " student_id TEXT PRIMARY KEY,"
+            " action INTEGER NOT NULL,"
+            " context BLOB NOT NULL,"
+            " decided_at REAL NOT NULL"
+            ") WITHOUT ROWID;"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------ policy
+
+    def version(self):
+        return self._conn().execute("SELECT version FROM policy_version").fetchone()[0]
+
+    def _read(self, conn, n_actions, context_dim, alpha):
+        rows = conn.execute(
+            "SELECT action, context_dim, alpha, A, A_inv, b FROM policy ORDER BY action"
+        ).fetchall()
+        agent = LinUCB(n_actions=n_actions, context_dim=context_dim, alpha=alpha)
+        if not rows:
+            return agent
+        if len(rows) != n_actions or rows[0][1] != context_dim:
+            print(f"[WARN] Stored policy has shape ({len(rows)}, {rows[0][1]}), expected "
+                  f"({n_actions}, {context_dim}) — starting from an untrained policy")
+            return agent
+
+        d = context_dim
+        agent.alpha = rows[0][2]
+        for a, _, _, A, A_inv, b in rows:
+            agent.A[a] = _array(A, (d, d))
+            agent.A_inv[a] = _array(A_inv, (d, d))
+            agent.b[a] = _array(b, (d,))
+        return agent
+
+    def _write(self, conn, agent, actions):
+        conn.executemany(
+            "INSERT INTO policy (action, context_dim, alpha, A, A_inv, b, n_updates)"
+            " VALUES (?, ?, ?, ?, ?, ?, 0)"
+            " ON CONFLICT (action) DO UPDATE SET"
+            " context_dim = excluded.context_dim, alpha = excluded.alpha,"
+            " A = excluded.A, A_inv = excluded.A_inv, b = excluded.b",
+            (
+                (int(a), agent.context_dim, float(agent.alpha),
+                 _blob(agent.A[a]), _blob(agent.A_inv[a]), _blob(agent.b[a]))
+                for a in actions
+            ),
+        )
+        conn.execute("UPDATE policy_version SET version = version + 1")
+
+    def load(self, n_actions, context_dim, alpha=1.0):
+        """Return (LinUCB, version); an untrained policy if nothing is stored."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT version FROM policy_version").fetchone()[0]
+            agent = self._read(conn, n_actions, context_dim, alpha)
+        finally:
+            conn.execute("COMMIT")
+        return agent, version
+
+    def save(self, agent):
+        """Replace the stored policy with `agent` (e.g. after offline training)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM policy")
+            self._write(conn, agent, range(agent.n_actions))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------------------ online updates
+
+    def record_decisions(self, student_ids, actions, contexts):
+        """Remember the action and context chosen for each learner (latest wins)."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO decisions (student_id, action, context, decided_at)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    (normalize_student_id(s), int(a), _blob(x), now)
+                    for s, a, x in zip(student_ids, actions, contexts)
+                ),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reward(self, student_id, reward, n_actions, context_dim, max_age=DECISION_TTL_SECONDS):
+        """Credit `reward` to the learner's pending decision and update the policy.
+
+        The decision is consumed, so each recommendation is rewarded at most
+        once. Returns the rewarded action, or None if there was no decision
+        younger than `max_age` seconds.
+        """
+        sid = normalize_student_id(student_id)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT action, context, decided_at FROM decisions WHERE student_id = ?", (sid,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("DELETE FROM decisions WHERE student_id = ?", (sid,))
+
+            action, context, decided_at = row
+            if time.time() - decided_at > max_age or action >= n_actions:
+                conn.execute("COMMIT")
+                return None
+
+            agent = self._read(conn, n_actions, context_dim, alpha=1.0)
+            stored = conn.execute(
+                "SELECT COUNT(*) FROM policy WHERE context_dim = ?", (context_dim,)
+            ).fetchone()[0] == n_actions
+            agent.update(action, _array(context, (context_dim,)), float(reward))
+            if not stored:
+                # first update (or shape change): persist the whole policy
+                conn.execute("DELETE FROM policy")
+            self._write(conn, agent, [action] if stored else range(n_actions))
+            conn.execute("UPDATE policy SET n_updates = n_updates + 1 WHERE action = ?", (action,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return action
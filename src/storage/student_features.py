@@ -0,0 +1,169 @@
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Served and trained-on features, in this order
+FEATURE_COLUMNS = ["total_interactions", "avg_time_spent", "correct_rate", "active_days", "max_inactivity_gap"]
+# Inputs of the XGBoost risk model
+RISK_FEATURES = ["avg_time_spent", "total_interactions", "correct_rate"]
+# Engagement part of the LinUCB context
+ENGAGEMENT_FEATURES = ["total_interactions", "avg_time_spent", "active_days", "max_inactivity_gap"]
+
+# Per-student running statistics the features are derived from
+_STATS = ["n", "sum_time", "n_correct", "first_ts", "last_ts", "max_gap"]
+_N, _SUM_TIME, _N_CORRECT, _FIRST, _LAST, _MAX_GAP = range(len(_STATS))
+
+_DAY_NS = 86_400 * 10**9
+
+
+def _stats_frame(interactions):
+    """Running statistics of every student, one vectorized groupby pass."""
+    df = interactions[["student_id", "timestamp", "time_spent", "is_correct"]]
+    df = df.sort_values(["student_id", "timestamp"], kind="stable")
+    ts = df["timestamp"].to_numpy("datetime64[ns]").astype(np.int64)
+
+    # whole days between consecutive events of the same student
+    same = df["student_id"].eq(df["student_id"].shift()).to_numpy()
+    gaps = np.where(same, np.diff(ts, prepend=ts[:1]) // _DAY_NS, 0)
+
+    g = pd.DataFrame({
+        "student_id": df["student_id"].array,
+        "time_spent": df["time_spent"].astype(float).to_numpy(),
+        "is_correct": df["is_correct"].astype(float).to_numpy(),
+        "ts": ts,
+        "gap": gaps,
+    }).groupby("student_id", sort=False, observed=True)
+    return pd.DataFrame({
+        "n": g.size(),
+        "sum_time": g["time_spent"].sum(),
+        "n_correct": g["is_correct"].sum(),
+        "first_ts": g["ts"].min(),
+        "last_ts": g["ts"].max(),
+        "max_gap": g["gap"].max(),
+    })
+
+
+def _features(s):
+    n = s[_N]
+    return {
+        "total_interactions": int(n),
+        "avg_time_spent": s[_SUM_TIME] / n,
+        "correct_rate": s[_N_CORRECT] / n,
+        "active_days": int((s[_LAST] - s[_FIRST]) // _DAY_NS) + 1,
+        "max_inactivity_gap": float(s[_MAX_GAP]),
+    }
+
+
+class StudentFeatures:
+    """Materialized per-student feature table.
+
+    Built from the interactions in one grouped pass and then kept current one
+    event at a time: every feature is derived from a handful of running
+    statistics (count, sums, first/last timestamp, largest gap), so recording
+    an interaction and reading a learner's features are both O(1). Training
+    (`train_risk_model`) and serving read the same definitions.
+    """
+
+    def __init__(self, stats=None):
+        self._stats = stats or {}
+
+    @classmethod
+    def from_interactions(cls, interactions):
+        if interactions.empty:
+            return cls()
+        frame = _stats_frame(interactions)
+        return cls(dict(zip(frame.index, frame[_STATS].to_numpy(dtype=float).tolist())))
+
+    def add(self, row):
+        """Fold one interaction in; returns False if it is older than the
+        student's latest event (gaps then need `set_student`)."""
+        sid = row["student_id"]
+        ts = pd.Timestamp(row["timestamp"]).value
+        correct = float(row["is_correct"])
+        s = self._stats.get(sid)
+        if s is None:
+            self._stats[sid] = [1.0, float(row["time_spent"]), correct, ts, ts, 0.0]
+            return True
+        if ts < s[_LAST]:
+            return False
+        s[_MAX_GAP] = max(s[_MAX_GAP], float((ts - s[_LAST]) // _DAY_NS))
+        s[_N] += 1
+        s[_SUM_TIME] += float(row["time_spent"])
+        s[_N_CORRECT] += correct
+        s[_LAST] = ts
+        return True
+
+    def set_student(self, student_id, student_df):
+        """Recompute one student from their full history."""
+        if student_df.empty:
+            self._stats.pop(student_id, None)
+        else:
+            self._stats[student_id] = _stats_frame(student_df)[_STATS].to_numpy(dtype=float)[0].tolist()
+
+    def set_students(self, interactions):
+        """Recompute every student present in `interactions`, which must hold their full histories."""
+        if interactions.empty:
+            return
+        frame = _stats_frame(interactions)
+        self._stats.update(zip(frame.index, frame[_STATS].to_numpy(dtype=float).tolist()))
+
+    def get(self, student_id):
+        """Feature dict for one student, or None if they have no interactions."""
+        s = self._stats.get(student_id)
+        return None if s is None else _features(s)
+
+    def count(self, student_id):
+        """Number of interactions of one student (0 if unseen)."""
+        s = self._stats.get(student_id)
+        return 0 if s is None else int(s[_N])
+
+    def frame(self, student_ids=None):
+        """Features of `student_ids` (default: everyone) indexed by student_id.
+
+        Students without interactions get zero rows.
+        """
+        ids = list(self._stats) if student_ids is None else list(student_ids)
+        stats = np.array([self._stats.get(sid, [np.nan] * len(_STATS)) for sid in ids], dtype=float)
+        stats = stats.reshape(len(ids), len(_STATS))
+        n = stats[:, _N]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            df = pd.DataFrame({
+                "total_interactions": n,
+                "avg_time_spent": stats[:, _SUM_TIME] / n,
+                "correct_rate": stats[:, _N_CORRECT] / n,
+                "active_days": (stats[:, _LAST] - stats[:, _FIRST]) // _DAY_NS + 1,
+                "max_inactivity_gap": stats[:, _MAX_GAP],
+            }, index=pd.Index(ids, name="student_id"))
+        df = df.fillna(0.0)
+        return df.astype({"total_interactions": "int64", "active_days": "int64"})
+
+    def __len__(self):
+        return len(self._stats)
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path, n_rows):
+        """Write the statistics as parquet, stamped with the interaction count they cover."""
+        ids = list(self._stats)
+        stats = np.array([self._stats[sid] for sid in ids], dtype=float).reshape(len(ids), len(_STATS))
+        table = pa.table({"student_id": ids, **{c: stats[:, k] for k, c in enumerate(_STATS)}})
+        table = table.replace_schema_metadata({b"n_rows": str(int(n_rows)).encode()})
+        # unique per writer: several API workers' compactors may save at once
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, path):
+        """Return (table, n_rows) from `save()`."""
+        table = pq.read_table(path)
+        n_rows = int(table.schema.metadata[b"n_rows"])
+        df = table.to_pandas()
+        return cls(dict(zip(df["student_id"], df[_STATS].to_numpy(dtype=float).tolist()))), n_rows
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from src.models.akt import AKT, build_inputs
+from src.models.akt_cache import AKTInferenceCache
+from src.models.bkt import BKTModel
+from src.models.vocab import Vocabulary
+
+WINDOW = 16
+
+
+def _history(n, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "student_id": ["s1"] * n,
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "concept_id": [f"c{i}" for i in rng.randint(0, 6, size=n)],
+        "is_correct": rng.randint(0, 2, size=n),
+    })
+
+
+def _setup():
+    torch.manual_seed(0)
+    model = AKT(num_concepts=6, embedding_dim=16, num_heads=4).eval()
+    vocab = Vocabulary([f"c{i}" for i in range(6)])
+    return model, vocab, AKTInferenceCache(model, vocab, BKTModel(), window=WINDOW)
+
+
+def _reference(model, vocab, history, concept):
+    """Last position of a causal forward pass over the window ending at the query step."""
+    query = pd.DataFrame({
+        "student_id": ["s1"],
+        "timestamp": [history["timestamp"].iloc[-1] + pd.Timedelta(hours=1)],
+        "concept_id": [concept],
+        "is_correct": [0],  # label of the query step is never an input
+    })
+    concepts, responses, mastery, _ = build_inputs(pd.concat([history, query], ignore_index=True), vocab, BKTModel())
+    concepts, responses, mastery = concepts[-WINDOW:], responses[-WINDOW:], mastery[-WINDOW:]
+    with torch.no_grad():
+        out = model(
+            torch.as_tensor(concepts, dtype=torch.long)[None],
+            torch.as_tensor(responses, dtype=torch.long)[None],
+            torch.as_tensor(mastery, dtype=torch.float)[None, :, None],
+            causal=True,
+        )
+    return float(out[0, -1, 0]), float(mastery[-1])
+
+
+@pytest.mark.parametrize("n", [1, 5, WINDOW - 1, WINDOW, 3 * WINDOW])
+def test_predict_matches_causal_forward(n):
+    model, vocab, cache = _setup()
+    history = _history(n)
+    for concept in ["c0", "c3"]:
+        expected, prior = _reference(model, vocab, history, concept)
+        entry = cache.rebuild("s1", history)
+        assert cache.predict(entry, concept, prior) == pytest.approx(expected, abs=1e-5)
+
+
+@pytest.mark.parametrize("n", [4, 2 * WINDOW])
+def test_append_matches_rebuild(n):
+    model, vocab, cache = _setup()
+    history = _history(n + 6, seed=1)
+    _, _, mastery, _ = build_inputs(history, vocab, BKTModel())
+
+    cache.rebuild("s1", history.iloc[:n])
+    for k in range(n, len(history)):
+        row = history.iloc[k]
+        cache.append("s1", row["concept_id"], row["is_correct"], float(mastery[k]), n_rows=k + 1)
+
+    expected, prior = _reference(model, vocab, history, "c2")
+    appended = cache._entries["s1"]
+    entry = cache.get("s1", history)
+    # served from the appended steps, not rebuilt
+    assert entry is appended
+    assert cache.predict(entry, "c2", prior) == pytest.approx(expected, abs=1e-5)
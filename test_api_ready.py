@@ -0,0 +1,49 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import src.api.registry as registry_module
+from src.api.main import app
+
+
+def test_endpoints_answer_503_promptly_during_warm_up(monkeypatch):
+    release = threading.Event()
+
+    def slow_load(self):
+        release.wait(30)
+        raise RuntimeError("load stopped by the test")
+
+    monkeypatch.setattr(registry_module.ModelRegistry, "load", slow_load)
+    monkeypatch.setattr(registry_module, "_registry", None)
+
+    with TestClient(app) as client:
+        try:
+            for method, path, body in [
+                ("get", "/ready", None),
+                ("get", "/learner/1/next", None),
+                ("post", "/learners/next", {"learner_ids": [1, 2]}),
+                ("get", "/ready", None),
+            ]:
+                start = time.perf_counter()
+                res = client.request(method.upper(), path, json=body)
+                assert time.perf_counter() - start < 1.0, path
+                assert res.status_code == 503, path
+                assert res.headers["retry-after"] == "1"
+            assert client.get("/ready").json()["ready"] is False
+        finally:
+            release.set()
+
+
+def test_malformed_batch_request_is_422(monkeypatch):
+    monkeypatch.setattr(registry_module.ModelRegistry, "load", lambda self: None)
+    monkeypatch.setattr(registry_module, "_registry", None)
+
+    with TestClient(app) as client:
+        for kwargs in [
+            {"json": {"learner_ids": 5}},
+            {"json": {"learner_ids": ["x"]}},
+            {"json": {}},
+            {"content": b"not json", "headers": {"content-type": "application/json"}},
+        ]:
+            assert client.post("/learners/next", **kwargs).status_code == 422, kwargs
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from src.models.bkt import BKTModel
+from src.pipelines.run_bkt import compute_mastery
+
+
+def _interactions(n=3000, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "student_id": rng.randint(0, 40, size=n).astype(str),
+        "concept_id": [f"c{i}" for i in rng.randint(0, 6, size=n)],
+        "is_correct": rng.randint(0, 2, size=n),
+    })
+
+
+def _scalar(df, bkt):
+    return np.array([
+        bkt.update(s, c, bool(y))
+        for s, c, y in zip(df["student_id"], df["concept_id"], df["is_correct"])
+    ])
+
+
+def test_batch_mastery_matches_scalar_updates():
+    df = _interactions()
+    params = dict(p_init=0.3, p_learn=0.1, p_guess=0.25, p_slip=0.05)
+
+    expected = _scalar(df, BKTModel(**params))
+    actual = BKTModel(**params).batch_mastery(df["student_id"], df["concept_id"], df["is_correct"])
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_batch_mastery_long_sequence():
+    # a single key with a long history exercises many scan passes and rescaling.
+    # Mostly-wrong answers keep the scalar model away from p == 1.0, where float
+    # rounding makes it stick while the matrix form keeps the residual mass.
+    rng = np.random.RandomState(1)
+    df = pd.DataFrame({"student_id": "s", "concept_id": "c", "is_correct": (rng.rand(5000) < 0.35).astype(int)})
+
+    expected = _scalar(df, BKTModel())
+    actual = BKTModel().batch_mastery(df["student_id"], df["concept_id"], df["is_correct"])
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_sharded_mastery_matches_single_process():
+    df = _interactions(n=500, seed=2)
+
+    single = compute_mastery(df, BKTModel(), n_jobs=1)
+    sharded = compute_mastery(df, BKTModel(), n_jobs=2)
+
+    np.testing.assert_allclose(sharded, single)
+
+
+def test_batch_mastery_continues_from_initial_state():
+    df = _interactions(n=2000, seed=2)
+    head, tail = df.iloc[:1200], df.iloc[1200:]
+
+    scalar = BKTModel()
+    _scalar(head, scalar)
+    expected = _scalar(tail, scalar)
+
+    # state as it stood before the tail, i.e. after the head only
+    before = BKTModel()
+    _scalar(head, before)
+    initial = [before.get_mastery(s, c) for s, c in zip(tail["student_id"], tail["concept_id"])]
+    actual = BKTModel().batch_mastery(tail["student_id"], tail["concept_id"], tail["is_correct"], initial=initial)
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12)
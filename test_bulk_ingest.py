@@ -0,0 +1,35 @@
+import json
+
+from data.schemas.interaction_schema import validate_events
+from src.storage.bulk_ingest import read_ndjson
+
+
+def _chunk(records):
+    return "\n".join(json.dumps(r) for r in records).encode()
+
+
+def test_numeric_ids_survive_a_null_in_the_chunk():
+    records = [
+        {"student_id": 123, "timestamp": "2024-03-01T10:00:00", "concept_id": 7, "is_correct": 1},
+        {"student_id": None, "timestamp": "2024-03-01T10:01:00", "concept_id": 7, "is_correct": 0},
+        {"student_id": 7, "timestamp": "2024-03-01T10:02:00", "concept_id": None, "is_correct": 1, "activity_id": 42},
+    ]
+    df, errors = read_ndjson(_chunk(records))
+    assert errors == []
+    events, rejected = validate_events(df.drop(columns="_line"))
+    assert list(events["student_id"]) == ["123"]
+    assert list(events["concept_id"]) == ["7"]
+    assert list(rejected["reason"]) == ["missing student_id", "missing concept_id"]
+
+
+def test_missing_activity_ids_stay_null_across_chunks():
+    ids = []
+    for first in (0, 2):
+        records = [
+            {"student_id": s, "timestamp": f"2024-03-01T10:0{first + k}:00", "concept_id": "c1", "is_correct": 1}
+            for k, s in enumerate(["a", "b"])
+        ]
+        df, _ = read_ndjson(_chunk(records), first_line=first)
+        events, _ = validate_events(df.drop(columns="_line"))
+        ids += list(events["activity_id"])
+    assert ids == [None] * 4
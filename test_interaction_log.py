@@ -0,0 +1,136 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from src.storage.interaction_log import STALE_CLAIM_SECONDS, InteractionLog
+
+
+def _row(student, k):
+    return {
+        "student_id": str(student),
+        "timestamp": pd.Timestamp("2024-01-01") + pd.Timedelta(seconds=k),
+        "activity_id": f"a{k}",
+        "concept_id": f"c{k % 5}",
+        "is_correct": k % 2,
+        "attempts": 1,
+        "time_spent": float(k),
+        "activity_type": "practice",
+        "difficulty": 0.5,
+    }
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _append_worker(root, worker, n):
+    log = InteractionLog(root)
+    for k in range(n):
+        log.append_many([_row(f"w{worker}", k)], sync=k % 10 == 0)
+    log.close()
+
+
+def _compact_worker(root, rounds):
+    log = InteractionLog(root)
+    for _ in range(rounds):
+        log.compact()
+        time.sleep(0.01)
+
+
+def test_compaction_keeps_every_row(tmp_path):
+    log = InteractionLog(tmp_path)
+    rows = [_row(s, k) for s in range(7) for k in range(30)]
+    log.append_many(rows[:100])
+    log.append_many(rows[100:])
+
+    assert log.compact() == len(rows)
+    dataset, tail = log.snapshot()
+    assert tail == {}
+    assert dataset.count_rows() == len(rows)
+
+    df = dataset.scan(student_ids=["3"])
+    assert len(df) == 30
+    assert df["timestamp"].is_monotonic_increasing
+    assert list(df["time_spent"]) == [float(k) for k in range(30)]
+
+
+def test_reader_sees_other_writer_before_and_after_compaction(tmp_path):
+    writer, reader = InteractionLog(tmp_path), InteractionLog(tmp_path)
+    reader.snapshot()
+
+    segment = writer.append_many([_row("a", k) for k in range(5)])
+    dataset, tail, compacted, missed = reader.read_new()
+    assert dataset is None and len(tail[segment]) == 5
+
+    writer.append_many([_row("a", k) for k in range(5, 8)])
+    writer.compact()
+    # three rows went straight from the segment into parts
+    dataset, tail, compacted, missed = reader.read_new()
+    assert tail == {} and compacted == {segment} and len(missed) == 1
+    assert dataset.count_rows() == 8
+    assert reader.claim_students(missed[0]) == ["a"]
+    assert len(reader.read_all()) == 8
+
+
+def test_dead_writer_segment_is_sealed_and_compacted(tmp_path):
+    log = InteractionLog(tmp_path)
+    log.wal_dir.mkdir(parents=True)
+    lines = "".join(json.dumps(_row("x", k), default=str) + "\n" for k in range(4))
+    segment = log.wal_dir / f"seg-{_dead_pid()}-deadbeef0000.open"
+    # last line torn by the crash
+    segment.write_text(lines + '{"student_id": "x", "timest')
+
+    assert log.compact() == 4
+    assert not list(log.wal_dir.iterdir())
+    assert len(log.read_all()) == 4
+
+
+def test_live_writer_segment_is_left_alone(tmp_path):
+    writer, compactor = InteractionLog(tmp_path), InteractionLog(tmp_path)
+    writer.append_many([_row("x", k) for k in range(3)])
+
+    assert compactor.compact() == 0
+    assert [p.suffix for p in writer.wal_dir.iterdir()] == [".open"]
+
+    writer.close()
+    assert compactor.compact() == 3
+
+
+def test_crashed_compaction_is_recovered(tmp_path):
+    log = InteractionLog(tmp_path)
+    log.append_many([_row("x", k) for k in range(3)])
+    log.close()
+    sealed = next(log.wal_dir.glob("*.jsonl"))
+
+    # claimed by a compaction that died before committing
+    claimed = sealed.with_name(f"{sealed.stem}.0123456789ab.compacting")
+    os.rename(sealed, claimed)
+    old = time.time() - STALE_CLAIM_SECONDS - 1
+    os.utime(claimed, (old, old))
+
+    assert log.compact() == 3
+    assert len(InteractionLog(tmp_path).read_all()) == 3
+
+
+def test_concurrent_appenders_and_compactors(tmp_path):
+    workers, n = 4, 200
+    procs = [multiprocessing.Process(target=_append_worker, args=(tmp_path, w, n)) for w in range(workers)]
+    procs += [multiprocessing.Process(target=_compact_worker, args=(tmp_path, 20)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+
+    InteractionLog(tmp_path).compact()
+    df = InteractionLog(tmp_path).read_all()
+    assert len(df) == workers * n
+    assert not df.duplicated(["student_id", "activity_id"]).any()
+    assert sorted(df["student_id"].unique()) == [f"w{w}" for w in range(workers)]
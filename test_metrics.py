@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import src.api.orchestrator as orchestrator
+from src.api.metrics import Metrics, server_timing
+from src.api.response_cache import ResponseCache
+from src.storage.feature_store import FeatureStore
+
+
+def test_orchestration_pass_is_timed_per_stage(tmp_path, monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(orchestrator, "METRICS", metrics)
+    registry = SimpleNamespace(fs=FeatureStore(data_path=tmp_path), model_version="m1", response_cache=ResponseCache())
+
+    timings = {}
+    results = orchestrator.get_next_learning_steps([1, 2], registry, timings)
+    # neither learner has history: answered by the cold-start fallback after the history stage
+    assert results == [orchestrator.COLD_START] * 2
+    assert list(timings) == ["cache", "history"] and all(t >= 0 for t in timings.values())
+    assert server_timing(timings).startswith("cache;dur=")
+
+    text = metrics.render({"dsarg_test_gauge": ("test gauge", 3)})
+    assert 'dsarg_stage_seconds_count{stage="cache"} 1' in text
+    assert 'dsarg_stage_seconds_bucket{stage="history",le="+Inf"} 1' in text
+    assert 'dsarg_fallbacks_total{stage="cold_start"} 2' in text
+    assert "dsarg_test_gauge 3" in text
@@ -0,0 +1,52 @@
+import pandas as pd
+import torch
+
+from src.models.ncf import NCF
+from src.models.ncf_index import NCFIndex
+from src.models.vocab import Vocabulary
+from src.storage.feature_store import FeatureStore
+
+
+def _store(tmp_path):
+    fs = FeatureStore(data_path=tmp_path)
+    fs.record_interactions([
+        {"student_id": s, "concept_id": f"c{k}", "is_correct": False, "timestamp": pd.Timestamp("2024-06-01") + pd.Timedelta(hours=k)}
+        for s in range(4) for k in range(3)
+    ], sync=False)
+    return fs
+
+
+def _index(fs, model_mtime=1):
+    torch.manual_seed(0)
+    model = NCF(num_users=4, num_items=5)
+    users, items = Vocabulary([str(s) for s in range(4)]), Vocabulary([f"c{k}" for k in range(5)])
+    interactions = fs.query(columns=["student_id", "concept_id", "is_correct"])
+    return model, NCFIndex.build(model, users, items, interactions, k=5, model_mtime=model_mtime)
+
+
+def test_refresh_picks_up_backfilled_events(tmp_path):
+    fs = _store(tmp_path)
+    model, index = _index(fs)
+    assert index.refresh(model, fs) == 0
+
+    # an old LMS export: events far older than anything indexed
+    best = index.lookup(2)[0]
+    fs.record_interaction(2, best, True, timestamp="2013-02-01")
+    assert index.refresh(model, fs) == 1
+    assert index.lookup(2)[0] != best
+    assert index.refresh(model, fs) == 0
+
+    # rows agree with a full rebuild
+    _, rebuilt = _index(fs)
+    assert (index.topk == rebuilt.topk).all()
+
+
+def test_index_is_tied_to_its_model(tmp_path):
+    fs = _store(tmp_path)
+    _, index = _index(fs, model_mtime=123)
+    index.save(tmp_path / "ncf_topk.npz")
+    loaded = NCFIndex.load(tmp_path / "ncf_topk.npz")
+
+    assert loaded.matches(123, index.users, index.items)
+    assert not loaded.matches(124, index.users, index.items)
+    assert not loaded.matches(123, index.users, Vocabulary(["c0"]))
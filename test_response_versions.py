@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+import src.api.orchestrator as orchestrator
+from src.api.response_cache import ResponseCache
+from src.storage.feature_store import FeatureStore
+
+
+def test_one_learners_interaction_keeps_other_learners_cached(tmp_path, monkeypatch):
+    fs = FeatureStore(data_path=tmp_path)
+    for lid in (7, 8):
+        fs.record_interaction(lid, "c1", True, timestamp="2024-03-01")
+    registry = SimpleNamespace(fs=fs, model_version="m1", policy_version=1, response_cache=ResponseCache())
+    computed = []
+
+    def compute(ids, registry, clock):
+        computed.extend(ids)
+        return [{"learner": lid, "n": registry.fs.history_length(lid)} for lid in ids]
+
+    monkeypatch.setattr(orchestrator, "_compute_next_steps", compute)
+    _, before, _ = orchestrator.get_next_learning_step_versioned(7, registry)
+
+    # learner 8 interacts: their history grows and the reward updates the shared policy
+    fs.record_interaction(8, "c1", False, timestamp="2024-03-02")
+    registry.policy_version += 1
+
+    result, after, cached = orchestrator.get_next_learning_step_versioned(7, registry)
+    assert cached and after == before and result == {"learner": 7, "n": 1}
+    _, _, cached = orchestrator.get_next_learning_step_versioned(8, registry)
+    assert not cached
+    assert computed == [7, 8]
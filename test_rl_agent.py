@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from src.models.rl_agent import LinUCB
+from src.storage.policy_store import PolicyStore
+
+
+class ReferenceLinUCB:
+    """The original list-of-matrices LinUCB, inverting A on every decision."""
+
+    def __init__(self, n_actions, context_dim, alpha=1.0):
+        self.n_actions = n_actions
+        self.alpha = alpha
+        self.A = [np.identity(context_dim) for _ in range(n_actions)]
+        self.b = [np.zeros((context_dim, 1)) for _ in range(n_actions)]
+
+    def scores(self, context):
+        context = context.reshape(-1, 1)
+        scores = []
+        for a in range(self.n_actions):
+            A_inv = np.linalg.inv(self.A[a])
+            theta = A_inv @ self.b[a]
+            p = theta.T @ context + self.alpha * np.sqrt(context.T @ A_inv @ context)
+            scores.append(float(p.item()))
+        return np.array(scores)
+
+    def select_action(self, context):
+        return int(np.argmax(self.scores(context)))
+
+    def update(self, action, context, reward):
+        context = context.reshape(-1, 1)
+        self.A[action] += context @ context.T
+        self.b[action] += reward * context
+
+
+def _contexts(n, d=6, seed=0):
+    rng = np.random.RandomState(seed)
+    return rng.rand(n, d), rng.uniform(-0.5, 2.0, size=n)
+
+
+def test_sequential_decisions_match_reference():
+    contexts, rewards = _contexts(500)
+    ref, agent = ReferenceLinUCB(5, 6, alpha=0.5), LinUCB(5, 6, alpha=0.5)
+
+    for x, r in zip(contexts, rewards):
+        np.testing.assert_allclose(agent.scores(x)[0], ref.scores(x), rtol=1e-8, atol=1e-10)
+        a = ref.select_action(x)
+        assert agent.select_action(x) == a
+        ref.update(a, x, r)
+        agent.update(a, x, r)
+
+    for a in range(5):
+        np.testing.assert_allclose(agent.A_inv[a], np.linalg.inv(ref.A[a]), rtol=1e-8, atol=1e-10)
+
+
+def test_batched_selection_matches_single_calls():
+    contexts, rewards = _contexts(300, seed=1)
+    agent = LinUCB(5, 6)
+    for x, r in zip(contexts[:200], rewards[:200]):
+        agent.update(agent.select_action(x), x, r)
+
+    batch = agent.select_actions(contexts[200:])
+    assert batch.tolist() == [agent.select_action(x) for x in contexts[200:]]
+
+
+def test_unnormalized_contexts_stay_close_to_reference():
+    # raw engagement features (counts, days) are large; the cached inverse must not drift
+    rng = np.random.RandomState(2)
+    contexts = np.column_stack([
+        rng.randint(1, 500, 2000), rng.uniform(0, 10, 2000), rng.randint(1, 60, 2000),
+        rng.uniform(0, 20, 2000), rng.rand(2000), rng.rand(2000),
+    ]).astype(float)
+    rewards = rng.uniform(-0.5, 2.0, size=2000)
+
+    ref, agent = ReferenceLinUCB(5, 6), LinUCB(5, 6)
+    for x, r in zip(contexts, rewards):
+        a = ref.select_action(x)
+        ref.update(a, x, r)
+        agent.update(a, x, r)
+
+    np.testing.assert_allclose(agent.scores(contexts[:50]), [ref.scores(x) for x in contexts[:50]], rtol=1e-6)
+
+
+def test_update_batch_matches_row_updates():
+    contexts, rewards = _contexts(400, seed=3)
+    actions = np.random.RandomState(3).randint(0, 5, size=400)
+    rowwise, batched = LinUCB(5, 6), LinUCB(5, 6)
+
+    for a, x, r in zip(actions, contexts, rewards):
+        rowwise.update(a, x, r)
+    for start in range(0, 400, 128):
+        batched.update_batch(actions[start:start + 128], contexts[start:start + 128], rewards[start:start + 128])
+
+    np.testing.assert_allclose(batched.A, rowwise.A)
+    np.testing.assert_allclose(batched.b, rowwise.b)
+    np.testing.assert_allclose(batched.A_inv, rowwise.A_inv, rtol=1e-8, atol=1e-10)
+
+
+def test_policy_store_keeps_every_workers_reward(tmp_path):
+    contexts, rewards = _contexts(120, seed=5)
+    actions = np.random.RandomState(5).randint(0, 5, size=120)
+    expected = LinUCB(5, 6)
+    for a, x, r in zip(actions, contexts, rewards):
+        expected.update(a, x, r)
+
+    # two API workers, each with its own store handle on the same file
+    path = tmp_path / "policy.sqlite"
+    version = PolicyStore(path).version()
+    errors = []
+
+    def worker(part):
+        store = PolicyStore(path)
+        try:
+            for i in part:
+                store.record_decisions([i], [actions[i]], [contexts[i]])
+                assert store.reward(i, rewards[i], 5, 6) == actions[i]
+                # a decision is rewarded at most once
+                assert store.reward(i, rewards[i], 5, 6) is None
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(range(k, 120, 2),)) for k in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    agent, new_version = PolicyStore(path).load(5, 6)
+    assert new_version == version + 120
+    np.testing.assert_allclose(agent.A, expected.A)
+    np.testing.assert_allclose(agent.b, expected.b)
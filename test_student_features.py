@@ -0,0 +1,35 @@
+import threading
+
+import pandas as pd
+
+from src.storage.student_features import StudentFeatures
+
+
+def test_concurrent_saves_publish_a_complete_file(tmp_path):
+    interactions = pd.DataFrame({
+        "student_id": [str(k % 50) for k in range(2000)],
+        "timestamp": pd.date_range("2024-01-01", periods=2000, freq="h"),
+        "time_spent": [float(k % 9) for k in range(2000)],
+        "is_correct": [k % 2 for k in range(2000)],
+    })
+    features = StudentFeatures.from_interactions(interactions)
+    path = tmp_path / "student_features.parquet"
+    errors = []
+
+    def save():
+        try:
+            for _ in range(20):
+                features.save(path, n_rows=2000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    loaded, n_rows = StudentFeatures.load(path)
+    assert n_rows == 2000 and len(loaded) == 50
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
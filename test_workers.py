@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.api.workers import InferencePool, Overloaded, WriterQueue
+
+
+def test_cancelled_call_keeps_its_slot_until_it_finishes():
+    pool = InferencePool(workers=1, max_pending=1)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    async def scenario():
+        task = asyncio.ensure_future(pool.run(work))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        # client went away; the worker thread is still busy
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert pool.stats()["pending"] == 1
+        with pytest.raises(Overloaded):
+            await pool.run(lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if pool.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await pool.run(lambda: "next") == "next"
+
+    asyncio.run(scenario())
+    pool.close()
+
+
+def test_batch_is_charged_several_slots():
+    pool = InferencePool(workers=1, max_pending=4)
+    release = threading.Event()
+
+    async def scenario():
+        big = asyncio.ensure_future(pool.run(release.wait, 5, slots=3))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["pending"] == 3
+        with pytest.raises(Overloaded):
+            await pool.run(lambda: None, slots=2)
+        small = asyncio.ensure_future(pool.run(lambda: "ok"))
+        release.set()
+        assert await big is True
+        assert await small == "ok"
+
+    asyncio.run(scenario())
+    assert pool.stats() == {"workers": 1, "pending": 0, "max_pending": 4, "rejected": 1}
+    pool.close()
+
+
+def test_writer_survives_a_cancelled_submit():
+    written, release = [], threading.Event()
+
+    def write_batch(items):
+        release.wait(5)
+        written.extend(items)
+        return items
+
+    writer = WriterQueue(write_batch, window=0.0)
+    blocker = writer.submit("first")
+    cancelled = writer.submit("gone")
+    # the client disconnected while its event was still queued
+    assert cancelled.cancel()
+    release.set()
+    assert blocker.result(5) == "first"
+    assert writer.submit("later").result(5) == "later"
+    writer.close()
+    assert written == ["first", "gone", "later"]